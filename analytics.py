@@ -0,0 +1,261 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Offline analytics over the games archived by the replay store.
+
+    Records are memory-mapped as a NumPy structured array and processed
+    in chunks, so memory usage depends on the chunk size only.
+    All games of a chunk are replayed at once: one step of the loop
+    puts the k-th move of every game on its board and checks the win lines.
+'''
+
+# Setup Python logging --------------------------------------------------------
+import logging
+
+FORMAT = '%(asctime)-15s %(levelname)s %(message)s'
+logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+LOG = logging.getLogger()
+
+
+# Imports----------------------------------------------------------------------
+import os
+import struct
+from argparse import ArgumentParser  # Parsing command line arguments
+
+import numpy as np
+
+from protocol import WIN_LINES
+from replay import REPLAY_FILE, MAGIC, MAX_MOVES, MOVES_SIZE, HEADER_FORMAT, HEADER_SIZE, RECORD_SIZE, \
+    GAME_RESULT
+
+
+# Common -----------------------------------------------------------------------
+CHUNK_SIZE = 1 << 16  # games per chunk
+
+# Same layout as replay.RECORD_FORMAT
+RECORD_DTYPE = np.dtype([
+    ('game_id', '<u4'),
+    ('owner_id', '<u4'),
+    ('opponent_id', '<u4'),
+    ('result', 'u1'),
+    ('n_moves', 'u1'),
+    ('moves', 'u1', (MOVES_SIZE,)),
+    ('pad', 'u1')
+])
+assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+# Cells on the board
+EMPTY, X, O = 0, 1, 2
+
+N_RESULTS = 3
+WIN_LINES_ARRAY = np.array(WIN_LINES)
+
+
+# Main functions ---------------------------------------------------------------
+def load_records(file_path=REPLAY_FILE):
+    '''
+    :param file_path: replay file
+    :return: (np.memmap) records of the replay file (empty array if there're no games)
+    '''
+    with open(file_path, 'rb') as f:
+        magic, version, record_size = struct.unpack(HEADER_FORMAT, f.read(HEADER_SIZE))
+    if magic != MAGIC or record_size != RECORD_SIZE:
+        raise ValueError("%s is not a replay file (version %s)" % (file_path, version))
+
+    n_records = (os.path.getsize(file_path) - HEADER_SIZE) // RECORD_SIZE
+    if n_records == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+
+    return np.memmap(file_path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(n_records,))
+
+
+def iter_chunks(records, chunk_size=CHUNK_SIZE):
+    ''' Yield consecutive slices of records (views, nothing is copied before use) '''
+    for start in range(0, len(records), chunk_size):
+        yield records[start:start + chunk_size]
+
+
+def decode_moves(packed):
+    '''
+    :param packed: (N, MOVES_SIZE) array of moves packed one per nibble
+    :return: (N, MAX_MOVES) array of cells 1-9 (0 after the last move)
+    '''
+    moves = np.empty((len(packed), MOVES_SIZE * 2), dtype=np.uint8)
+    moves[:, 0::2] = packed >> 4
+    moves[:, 1::2] = packed & 0x0F
+    return moves[:, :MAX_MOVES]
+
+
+def winners(boards, letter):
+    '''
+    :param boards: (N, 10) array of boards (index 0 is ignored like on the server)
+    :param letter: X or O
+    :return: (N,) bool array (True where the letter has a line)
+    '''
+    return (boards[:, WIN_LINES_ARRAY] == letter).all(axis=2).any(axis=1)
+
+
+def evaluate(moves, n_moves):
+    '''
+    Replay all games at once and check them.
+
+    :param moves: (N, MAX_MOVES) array of cells
+    :param n_moves: (N,) number of moves in each game
+    :return: (results, valid) - result (GAME_RESULT) computed from the moves and
+             bool array, False where the moves can't come from a real game
+    '''
+    n_games = len(moves)
+    rows = np.arange(n_games)
+    n_moves = n_moves.astype(np.intp)
+
+    boards = np.zeros((n_games, 10), dtype=np.uint8)
+    results = np.full(n_games, GAME_RESULT.TIE, dtype=np.uint8)
+    finished = np.zeros(n_games, dtype=bool)
+    valid = n_moves <= MAX_MOVES
+
+    for k in range(MAX_MOVES):
+        made = k < n_moves
+        cells = moves[:, k].astype(np.intp)
+        on_board = (cells >= 1) & (cells <= 9)
+
+        # No moves after the end of the game, only free cells 1-9 before it
+        valid &= np.where(made, on_board, cells == 0)
+        cells[~on_board] = 0
+        valid &= ~(made & finished)
+        valid &= ~made | (boards[rows, cells] == EMPTY)
+
+        letter = X if k % 2 == 0 else O
+        playing = made & valid
+        boards[rows[playing], cells[playing]] = letter
+
+        won = playing & winners(boards, letter)
+        results[won] = GAME_RESULT.OWNER_WON if letter == X else GAME_RESULT.OPPONENT_WON
+        finished |= won
+
+    # Game without a winner ends only when the board is full
+    valid &= finished | (n_moves == MAX_MOVES)
+    return results, valid
+
+
+class Report(object):
+    def __init__(self):
+        ''' Counters which are updated chunk by chunk '''
+        self.n_games = 0
+        self.n_invalid = 0
+        self.results = np.zeros(N_RESULTS, dtype=np.int64)
+        self.lengths = np.zeros(MAX_MOVES + 1, dtype=np.int64)
+        self.openings = np.zeros((10, N_RESULTS), dtype=np.int64)  # <first cell>, <result>
+        self.players = {}  # in format <player_id>: [wins, losses, ties]
+
+    def update(self, chunk):
+        moves = decode_moves(chunk['moves'])
+        n_moves = chunk['n_moves']
+        results, valid = evaluate(moves, n_moves)
+
+        # Stored result must agree with the moves
+        valid &= results == chunk['result']
+
+        self.n_games += len(chunk)
+        self.n_invalid += int((~valid).sum())
+
+        moves, n_moves, results = moves[valid], n_moves[valid], results[valid]
+        self.results += np.bincount(results, minlength=N_RESULTS)
+        self.lengths += np.bincount(n_moves, minlength=MAX_MOVES + 1)
+        self.openings += np.bincount(moves[:, 0].astype(np.intp) * N_RESULTS + results,
+                                     minlength=10 * N_RESULTS).reshape(10, N_RESULTS)
+
+        # [wins, losses, ties] of the owner and the opponent of each game
+        tie = results == GAME_RESULT.TIE
+        owner_won = results == GAME_RESULT.OWNER_WON
+        opponent_won = results == GAME_RESULT.OPPONENT_WON
+        for ids, won, lost in ((chunk['owner_id'][valid], owner_won, opponent_won),
+                               (chunk['opponent_id'][valid], opponent_won, owner_won)):
+            self._update_players(ids, np.column_stack((won, lost, tie)))
+
+    def _update_players(self, ids, outcomes):
+        ''' Sum outcomes per player inside the chunk, then merge into totals '''
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        totals = np.zeros((len(unique_ids), N_RESULTS), dtype=np.int64)
+        np.add.at(totals, inverse.ravel(), outcomes)
+
+        for player_id, counts in zip(unique_ids.tolist(), totals.tolist()):
+            stats = self.players.setdefault(player_id, [0] * N_RESULTS)
+            for i in range(N_RESULTS):
+                stats[i] += counts[i]
+
+    def show(self, top_players=10):
+        n_valid = self.n_games - self.n_invalid
+
+        print("Games: %d (invalid records: %d)" % (self.n_games, self.n_invalid))
+        if not n_valid:
+            return
+
+        owner_won, opponent_won, tie = (self.results[GAME_RESULT.OWNER_WON], self.results[GAME_RESULT.OPPONENT_WON],
+                                        self.results[GAME_RESULT.TIE])
+        print("Average game length: %.2f moves" % (np.dot(np.arange(MAX_MOVES + 1), self.lengths) / n_valid))
+        print("First mover (X) won: %.1f%%, second (O) won: %.1f%%, ties: %.1f%%" % (
+            100.0 * owner_won / n_valid, 100.0 * opponent_won / n_valid, 100.0 * tie / n_valid))
+        print("First-mover advantage: %+.1f%%" % (100.0 * (owner_won - opponent_won) / n_valid))
+
+        print("\nOpening move win rates (X won / O won / tie):")
+        for cell in range(1, 10):
+            played = self.openings[cell].sum()
+            if played:
+                print(" %d: %5.1f%% / %5.1f%% / %5.1f%%  (%d games)" % (
+                    cell,
+                    100.0 * self.openings[cell][GAME_RESULT.OWNER_WON] / played,
+                    100.0 * self.openings[cell][GAME_RESULT.OPPONENT_WON] / played,
+                    100.0 * self.openings[cell][GAME_RESULT.TIE] / played,
+                    played))
+
+        print("\nTop players by wins (wins / losses / ties):")
+        ranking = sorted(self.players.items(), key=lambda item: item[1][0], reverse=True)
+        for player_id, (wins, losses, ties) in ranking[:top_players]:
+            print(" %d: %d / %d / %d" % (player_id, wins, losses, ties))
+
+
+def player_history(records, player_id, chunk_size=CHUNK_SIZE):
+    '''
+    :param records: replay records
+    :param player_id: id of the player
+    :return: (list) (game_id, letter, result, number of moves) of all games of the player
+    '''
+    history = []
+    for chunk in iter_chunks(records, chunk_size):
+        games = chunk[(chunk['owner_id'] == player_id) | (chunk['opponent_id'] == player_id)]
+        for game in games:
+            letter = 'X' if game['owner_id'] == player_id else 'O'
+            history.append((int(game['game_id']), letter, int(game['result']), int(game['n_moves'])))
+    return history
+
+
+def main(args):
+    records = load_records(args.file)
+    LOG.info("Loaded %d games from %s" % (len(records), args.file))
+
+    if args.player is not None:
+        result_names = {GAME_RESULT.TIE: "tie", GAME_RESULT.OWNER_WON: "X won", GAME_RESULT.OPPONENT_WON: "O won"}
+        for game_id, letter, result, n_moves in player_history(records, args.player, args.chunk_size):
+            print("Game %d: played %s, %s in %d moves" % (game_id, letter, result_names.get(result, "?"), n_moves))
+        return
+
+    report = Report()
+    for chunk in iter_chunks(records, args.chunk_size):
+        report.update(chunk)
+    report.show()
+
+
+if __name__ == '__main__':
+    # Parsing arguments
+    parser = ArgumentParser(description="Statistics over archived Tic-Tac-Toe games")
+    parser.add_argument('-f', '--file',
+                        help='Replay file, defaults to %s' % REPLAY_FILE,
+                        default=REPLAY_FILE)
+    parser.add_argument('-c', '--chunk-size', type=int,
+                        help='Number of games processed at once, defaults to %d' % CHUNK_SIZE,
+                        default=CHUNK_SIZE)
+    parser.add_argument('--player', type=int,
+                        help='Show history of the player instead of the report')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,182 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Benchmark of the connect-to-first-move latency with and without TLS.
+
+    One round: two players connect, the first one starts a game, the second joins,
+    the first one makes a move and gets the response. Both players disconnect after that.
+    Modes:
+        tcp         - plain TCP
+        tls         - TLS, full handshake on every connection
+        tls-resumed - TLS, reconnects resume the previous session
+
+    Certificate for the server is generated with the openssl command line tool.
+'''
+
+# Setup Python logging --------------------------------------------------------
+import logging
+
+FORMAT = '%(asctime)-15s %(levelname)s %(message)s'
+logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+LOG = logging.getLogger()
+
+
+# Imports----------------------------------------------------------------------
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from argparse import ArgumentParser  # Parsing command line arguments
+from timeit import default_timer as timer
+from protocol import *
+from server import Server
+from transport import TcpTransport, TlsTransport, make_server_context, make_client_context
+
+
+# Common -----------------------------------------------------------------------
+MODES = ("tcp", "tls", "tls-resumed")
+ROUNDS = 200
+
+
+# Main functions ---------------------------------------------------------------
+def generate_certificate(directory, hostname):
+    '''
+    :param directory: where to put the files
+    :param hostname: name (or IP address) of the server in the certificate
+    :return: (certfile, keyfile)
+    '''
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.check_call(["openssl", "req", "-x509", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+                           "-nodes", "-days", "1", "-subj", "/CN=%s" % hostname,
+                           "-addext", "subjectAltName=DNS:localhost,IP:%s" % hostname,
+                           "-keyout", keyfile, "-out", certfile],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+
+def expect(reader, command):
+    ''' Receive messages until the one with the command, return its data '''
+    while True:
+        m = reader.receive()
+        if m is None:
+            raise RuntimeError("Connection closed while waiting for %s" % command)
+        resp_command, resp_code, data = parse_response(m)
+        if resp_command == command:
+            return data
+
+
+def play_round(transport):
+    '''
+    :return: (seconds from the first connect to the response on the first move, number of resumed sessions)
+    '''
+    started = timer()
+
+    owner_sock = transport.connect()
+    opponent_sock = transport.connect()
+    owner, opponent = FrameReader(owner_sock), FrameReader(opponent_sock)
+
+    tcp_send(owner_sock, [COMMAND.START_NEW_GAME, ""])
+    game_id = expect(owner, COMMAND.START_NEW_GAME)
+
+    tcp_send(opponent_sock, [COMMAND.JOIN_GAME, game_id])
+    expect(opponent, COMMAND.JOIN_GAME)
+    expect(owner, COMMAND.NOTIFICATION.YOUR_TURN)
+
+    tcp_send(owner_sock, [COMMAND.MAKE_MOVE, pack_data([game_id, 5])])
+    expect(owner, COMMAND.MAKE_MOVE)
+
+    elapsed = timer() - started
+    resumed = sum(1 for sock in (owner_sock, opponent_sock) if getattr(sock, 'session_reused', False))
+
+    transport.close(owner_sock)
+    transport.close(opponent_sock)
+    return elapsed, resumed
+
+
+def run_mode(mode, host, port, rounds, certfile, keyfile, replay_file):
+    '''
+    :return: (list) latencies in seconds, number of resumed sessions
+    '''
+    if mode == "tcp":
+        server_transport = client_transport = TcpTransport(host, port)
+    else:
+        server_transport = TlsTransport(TcpTransport(host, port), make_server_context(certfile, keyfile))
+        client_transport = TlsTransport(TcpTransport(host, port), make_client_context(certfile),
+                                        server_hostname=host)
+
+    server = Server(server_transport, replay_file=replay_file)
+    server_thread = threading.Thread(name='BenchmarkServer', target=server.main_loop)
+    server_thread.start()
+
+    # Wait until the server listens
+    while not server.running:
+        if not server_thread.is_alive():
+            raise RuntimeError("Server did not start on %s" % server_transport)
+        threading.Event().wait(0.01)
+
+    latencies, resumed = [], 0
+    try:
+        for _ in range(rounds):
+            # Every round starts from scratch, unless sessions are resumed
+            if mode == "tls":
+                client_transport.session = None
+
+            elapsed, n_resumed = play_round(client_transport)
+            latencies.append(elapsed)
+            resumed += n_resumed
+    finally:
+        server.stop()
+        server_thread.join()
+        server.replays.close()
+
+    return latencies, resumed
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+def main(args):
+    # Only the results are interesting here
+    LOG.setLevel(logging.WARNING)
+
+    directory = tempfile.mkdtemp()
+    try:
+        certfile, keyfile = generate_certificate(directory, args.host)
+
+        print("%-12s %10s %10s %10s %8s" % ("mode", "mean, ms", "p50, ms", "p95, ms", "resumed"))
+        for mode in args.modes:
+            replay_file = os.path.join(directory, "%s.bin" % mode)
+            latencies, resumed = run_mode(mode, args.host, args.port, args.rounds, certfile, keyfile, replay_file)
+
+            print("%-12s %10.3f %10.3f %10.3f %8d" % (
+                mode,
+                1000 * sum(latencies) / len(latencies),
+                1000 * percentile(latencies, 50),
+                1000 * percentile(latencies, 95),
+                resumed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    # Parsing arguments
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-H', '--host',
+                        help='Server INET address (IP), defaults to %s' % SERVER_INET_ADDR,
+                        default=SERVER_INET_ADDR)
+    parser.add_argument('-p', '--port', type=int,
+                        help='Server TCP port, defaults to %d' % SERVER_PORT,
+                        default=SERVER_PORT)
+    parser.add_argument('-n', '--rounds', type=int,
+                        help='Rounds per mode, defaults to %d' % ROUNDS,
+                        default=ROUNDS)
+    parser.add_argument('-m', '--modes', nargs='+', choices=MODES,
+                        help='Modes to run, defaults to all of them',
+                        default=list(MODES))
+    args = parser.parse_args()
+    main(args)
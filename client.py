@@ -1,4 +1,4 @@
-#! /usr/bin/env python
+#! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
 '''
@@ -18,14 +18,19 @@ LOG.info('Client-side started working...')
 
 # Imports----------------------------------------------------------------------
 import time
+import errno
 from argparse import ArgumentParser  # Parsing command line arguments
-from socket import AF_INET, SOCK_STREAM, socket, error as socket_error
+from socket import error as socket_error
 from threading import Thread, Lock
 from protocol import *
+from transport import make_transport, make_client_context
 
 
 class Client(object):
-    def __init__(self, host, port):
+    def __init__(self, transport):
+        '''
+        :param transport: how to connect to the server (see transport.py)
+        '''
         self.lock = Lock()
 
         self.exit = False
@@ -33,8 +38,9 @@ class Client(object):
 
         # Client's socket
         self.sock = None
-        self.sock_port = int(port)
-        self.sock_host = host
+        self.reader = None
+        self.writer = None
+        self.transport = transport
 
         self.game_id = None
         self.my_turn = False
@@ -42,20 +48,21 @@ class Client(object):
 
     # Declare client socket and connecting
     def connect(self):
-        self.sock = socket(AF_INET, SOCK_STREAM)
-
         try:
-            self.sock.connect((self.sock_host, self.sock_port))
-        except socket_error as (code, msg):
-            if code == 10061:
+            self.sock = self.transport.connect()
+        except socket_error as err:
+            if err.errno in (errno.ECONNREFUSED, 10061):
                 LOG.error('Socket error occurred. Server does not respond.')
             else:
-                LOG.error('Socket error occurred. Error code: %s, %s' % (code, msg))
+                LOG.error('Socket error occurred. Error code: %s, %s' % (err.errno, err.strerror))
             return None
         else:
             LOG.info('Connection is established successfully')
 
-        LOG.info('TCP Socket created and start to connect..')
+        self.writer = FrameWriter(self.sock, nodelay=NODELAY)
+        self.reader = FrameReader(self.sock, lock=self.writer.lock)  # notifications are read in another thread
+
+        LOG.info('Socket created and connected to %s' % self.transport)
         return self.sock
 
     def disconnect(self):
@@ -63,18 +70,19 @@ class Client(object):
         Disconnect from the server by closing the socket.
         Close socket it there're some problems.
         '''
-        close_socket(self.sock, "Close client socket.")
+        with self.writer.lock:
+            self.transport.close(self.sock, "Close client socket.")
 
     def request(self, command, data=""):
         ''' This method sends the given request to server '''
-        tcp_send(self.sock, [command, data])
+        self.writer.send([command, data])
         LOG.debug("Command %s was sent to server" % command)
 
     def make_move(self):
         # Let the player type in his move.
         move = ' '
         while move not in '1 2 3 4 5 6 7 8 9'.split():
-            move = raw_input("What is your next move? (1-9): ")
+            move = input("What is your next move? (1-9): ")
 
         # Request to the server to make move
         data = pack_data([self.game_id, move])
@@ -83,11 +91,11 @@ class Client(object):
     def start_game(self):
         self.game_end = False
 
-        print "Field structure:"
-        print "7|8|9"
-        print "4|5|6"
-        print "1|2|3"
-        print "-----"
+        print("Field structure:")
+        print("7|8|9")
+        print("4|5|6")
+        print("1|2|3")
+        print("-----")
 
         try:
             # Until the game is finished, player can play
@@ -129,13 +137,21 @@ class Client(object):
             text += "'gl' - to request a games list\n"
             text += "'ng' - to start a new game\n"
             text += "'jg' - to join existing game\n"
+            text += "'rp' - to replay finished game\n"
+            text += "'rt' - to register for the next tournament\n"
+            text += "'st' - to start the tournament for registered players\n"
+            text += "Enter - to play the assigned tournament game\n"
             text += "'exit' - to exit from the app\n"
-            print text
+            print(text)
 
         MENU_COOMAND = enum(
             GAMES_LIST="gl",
             START_NEW_GAME="ng",
             JOIN_GAME="jg",
+            GET_REPLAY="rp",
+            REGISTER_TOURNAMENT="rt",
+            START_TOURNAMENT="st",
+            PLAY_ASSIGNED_GAME="",
             EXIT="exit",
         )
 
@@ -144,12 +160,12 @@ class Client(object):
             while not self.exit:
                 self.wait = False
 
-                print "\nYou're in the main menu"
+                print("\nYou're in the main menu")
                 # Show all possible commands that client can request
                 all_possible_commands()
 
                 try:
-                    command = raw_input("Please, enter a command: \n")
+                    command = input("Please, enter a command: \n")
                 except KeyboardInterrupt:
                     LOG.debug('Ctrl+C issued ...')
                     command = 'exit'
@@ -162,17 +178,37 @@ class Client(object):
                     self.wait = True
 
                 elif command == MENU_COOMAND.JOIN_GAME:
-                    game_id = raw_input("Enter game_id: ").strip()
+                    game_id = input("Enter game_id: ").strip()
                     self.request(COMMAND.JOIN_GAME, data=game_id)
                     self.wait = True
 
+                elif command == MENU_COOMAND.GET_REPLAY:
+                    game_id = input("Enter game_id: ").strip()
+                    self.request(COMMAND.GET_REPLAY, data=game_id)
+                    self.wait = True
+
+                elif command == MENU_COOMAND.REGISTER_TOURNAMENT:
+                    self.request(COMMAND.REGISTER_TOURNAMENT)
+                    self.wait = True
+
+                elif command == MENU_COOMAND.START_TOURNAMENT:
+                    tournament_format = input("Enter format ('%s' - round robin, '%s' - swiss): " % (
+                        TOURNAMENT_FORMAT.ROUND_ROBIN, TOURNAMENT_FORMAT.SWISS)).strip()
+                    rounds = input("Enter number of rounds (empty for default): ").strip()
+                    self.request(COMMAND.START_TOURNAMENT, data=pack_data([tournament_format, rounds]))
+                    self.wait = True
+
+                elif command == MENU_COOMAND.PLAY_ASSIGNED_GAME:
+                    # Game (if it's assigned) is started below
+                    pass
+
                 elif command == MENU_COOMAND.EXIT:
                     with self.lock:
                         self.exit = True
                     break
 
                 else:
-                    print "Unrecognized command"
+                    print("Unrecognized command")
 
                 # If we need to wait some time (during game process or waiting for response),
                 # do timeout with 0.5 sec, until we will receive response
@@ -196,7 +232,7 @@ class Client(object):
 
             # Will receive notification until the app terminated
             while not self.exit:
-                m = tcp_receive(self.sock)
+                m = self.reader.receive()
 
                 # If total number of failures more than 5, then exit..
                 if n_fails > 5:
@@ -218,7 +254,7 @@ class Client(object):
                     # board = [' '] * 10
                     # self.draw_board(board)
 
-                    print "Now you need to wait until someone will be connected"
+                    print("Now you need to wait until someone will be connected")
 
                     with self.lock:
                         self.game_id = data
@@ -226,12 +262,12 @@ class Client(object):
 
                 elif command == COMMAND.JOIN_GAME:
                     if resp_code == RESP.GAME_DOES_NOT_EXIST:
-                        print "Game with requested id doesn't exist"
+                        print("Game with requested id doesn't exist")
                         with self.lock:
                             self.game_id = None
 
                     elif resp_code == RESP.GAME_ALREADY_STARTED:
-                        print "Game already started"
+                        print("Game already started")
                         with self.lock:
                             self.game_id = None
 
@@ -242,7 +278,7 @@ class Client(object):
                         # board = [' '] * 10
                         # self.draw_board(board)
 
-                        print "Now you need to you wait for your move..."
+                        print("Now you need to you wait for your move...")
                     with self.lock:
                         self.wait = False
 
@@ -251,13 +287,30 @@ class Client(object):
                     games = parse_data(data)
 
                     if games and games[0] != "":
-                        print "Available games: \n %s" % "\n".join(games)
+                        print("Available games: \n %s" % "\n".join(games))
+                    else:
+                        print("No available games")
+
+                elif command == COMMAND.GET_REPLAY:
+                    if resp_code == RESP.GAME_DOES_NOT_EXIST:
+                        print("Finished game with requested id doesn't exist")
+
+                    # Replay moves one by one, owner ("X") always moves first
                     else:
-                        print "No available games"
+                        board = [' '] * 10
+                        for n, move in enumerate(parse_data(data)):
+                            board[int(move)] = 'X' if n % 2 == 0 else 'O'
+                            self.draw_board(board)
+                            time.sleep(0.5)
+
+                        print("End of replay")
+
+                    with self.lock:
+                        self.wait = False
 
                 elif command == COMMAND.MAKE_MOVE:
                     if resp_code == RESP.MOVE_IS_INVALID:
-                        print "Your move is invalid. Please do again your move"
+                        print("Your move is invalid. Please do again your move")
                         with self.lock:
                             self.my_turn = True
 
@@ -266,14 +319,40 @@ class Client(object):
                         board = parse_data(data)
                         self.draw_board(board)
 
+                elif command == COMMAND.REGISTER_TOURNAMENT:
+                    print("You're registered for the next tournament, %s players now" % data)
+                    with self.lock:
+                        self.wait = False
+
+                elif command == COMMAND.START_TOURNAMENT:
+                    if resp_code == RESP.OK:
+                        tournament_id, rounds = parse_data(data)
+                        print("Tournament %s started, %s rounds" % (tournament_id, rounds))
+                    else:
+                        print("Tournament can't be started (wrong format or less than 2 registered players)")
+                    with self.lock:
+                        self.wait = False
+
                 #################
                 # Notifications
+                elif command == COMMAND.NOTIFICATION.GAME_ASSIGNED:
+                    print("Tournament game %s is assigned to you, press Enter to play" % data)
+                    with self.lock:
+                        self.game_id = data
+
+                elif command == COMMAND.NOTIFICATION.TOURNAMENT_ENDED:
+                    # Standings in format player_id, points, player_id, points, ...
+                    standings = parse_data(data)
+                    print("Tournament ended, standings:")
+                    for place, n in enumerate(range(0, len(standings), 2), 1):
+                        print(" %d. player %s - %s points" % (place, standings[n], standings[n + 1]))
+
                 elif command == COMMAND.NOTIFICATION.YOUR_TURN:
                     # Draw the field in current state
                     board = parse_data(data)
                     self.draw_board(board)
 
-                    print "It's your turn"
+                    print("It's your turn")
                     with self.lock:
                         self.my_turn = True
 
@@ -284,14 +363,14 @@ class Client(object):
                     board = parse_data(data)
                     self.draw_board(board)
 
-                    print "Game ended"
+                    print("Game ended")
 
                     if command == COMMAND.NOTIFICATION.YOU_WON:
-                        print "You won!"
+                        print("You won!")
                     elif command == COMMAND.NOTIFICATION.YOU_LOST:
-                        print "You lost!"
+                        print("You lost!")
                     else:
-                        print "It's a tie, nobody won.."
+                        print("It's a tie, nobody won..")
 
                     with self.lock:
                         self.game_end = True
@@ -308,12 +387,13 @@ class Client(object):
             self.exit = True
             self.wait = False
 
-        print 'Terminating from "notifications" loop thread ...'
+        print('Terminating from "notifications" loop thread ...')
 
 
 # Main part of client application
 def main(args):
-    client = Client(host=args.host, port=args.port)
+    tls_context = make_client_context(args.cafile) if args.tls or args.cafile else None
+    client = Client(make_transport(args.host, args.port, args.unix, tls_context))
 
     # Check if the socket was created correctly, if no then exit..
     if not client.connect():
@@ -330,14 +410,14 @@ def main(args):
     try:
         while not client.exit:
             time.sleep(0.2)
-    except KeyboardInterrupt, IOError:
+    except (KeyboardInterrupt, IOError):
         LOG.debug('Ctrl+C issued (or IOError)...')
         client.exit = True
 
     # Close client (socket) connection
     client.disconnect()
 
-    print 'Terminating ...'
+    print('Terminating ...')
 
     # Blocks until the thread finished the work.
     main_app_thread.join()
@@ -355,7 +435,13 @@ if __name__ == '__main__':
                         help='Server TCP port (to connect), '
                              'defaults to %d' % SERVER_PORT,
                         default=SERVER_PORT)
+    parser.add_argument('-u', '--unix',
+                        help='Path of the unix domain socket to connect instead of TCP')
+    parser.add_argument('--tls', action='store_true',
+                        help='Connect with TLS')
+    parser.add_argument('--cafile',
+                        help='Certificates to trust (PEM), implies --tls')
     args = parser.parse_args()
     main(args)
 
-    print 'App was terminated ...'
+    print('App was terminated ...')
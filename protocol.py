@@ -1,4 +1,4 @@
-#! /usr/bin/env python
+#! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
 # Setup Python logging --------------------------------------------------------
@@ -19,8 +19,16 @@ def info():
 
 
 # Imports----------------------------------------------------------------------
-from socket import error as socket_error
+from socket import IPPROTO_TCP, TCP_NODELAY, error as socket_error
+import ssl
+import errno
 import select
+import threading
+
+try:
+    from socket import TCP_CORK
+except ImportError:
+    TCP_CORK = None  # Linux only
 
 # Extend our PYTHONPATH for working directory----------------------------------
 import os
@@ -43,6 +51,22 @@ SEP = ".."  # separate command and data in request
 DATA_SEP = ":)"
 TIMEOUT = 5  # in seconds
 TERM_CHAR = "|.|"
+ENCODING = 'utf-8'  # messages are str inside the app and bytes on the wire
+TERM_BYTES = TERM_CHAR.encode(ENCODING)
+NODELAY = True  # messages are coalesced by FrameWriter, so don't wait for more data in the kernel
+IOV_MAX = 1024  # max number of buffers per one sendmsg call
+
+# Cells of the board which make a line (board cells are numbered like a numpad)
+WIN_LINES = (
+    (7, 8, 9),  # across the top
+    (4, 5, 6),  # across the middle
+    (1, 2, 3),  # across the bottom
+    (7, 4, 1),  # down the left side
+    (8, 5, 2),  # down the middle
+    (9, 6, 3),  # down the right side
+    (7, 5, 3),  # diagonal
+    (9, 5, 1)   # diagonal
+)
 
 
 # "Enum" for commands
@@ -55,16 +79,26 @@ COMMAND = enum(
     JOIN_GAME='2',
     GAMES_LIST='3',
     MAKE_MOVE='4',
+    GET_REPLAY='5',
+    REGISTER_TOURNAMENT='6',
+    START_TOURNAMENT='7',
 
     # Notifications from the server
     NOTIFICATION=enum(
         YOU_LOST='10',
         YOU_WON='11',
         YOUR_TURN='12',
-        GAME_IS_A_TIE='13'
+        GAME_IS_A_TIE='13',
+        GAME_ASSIGNED='14',
+        TOURNAMENT_ENDED='15'
     )
 )
 
+TOURNAMENT_FORMAT = enum(
+    ROUND_ROBIN='rr',
+    SWISS='swiss'
+)
+
 
 # Responses
 RESP = enum(
@@ -101,54 +135,228 @@ def error_code_to_string(err_code):
 
 def tcp_send(sock, data):
     '''
+    Send one message right away (use FrameWriter to coalesce several messages)
     :param sock: socket
     :param data: (list)
-    :return:
+    :return: True if the whole message was sent
     '''
-    query = SEP.join([str(el) for el in data]) + TERM_CHAR
-
-    try:
-        sock.sendall(query)
-        return True
-    except:
-        return False
+    return FrameWriter(sock).send(data)
 
 
 def tcp_receive(sock, buffer_size=BUFFER_SIZE):
     '''
+    Receive one message (use FrameReader on connections where messages may arrive together)
     :param sock: TCP socket
     :param buffer_size: max possible size of message per one receive call
-    :return: message without terminate characters
+    :return: message without terminate characters (None if connection is closed or broken)
     '''
-    m = ''
-    while 1:
-        try:
-            # Check if there is data available before call recv
-            ready, _, _ = select.select([sock], [], [])
+    return FrameReader(sock, buffer_size).receive()
 
-            # Nothing is received yet
-            if not ready:
-                return None
 
-            # ready to receive
-            else:
-                # Receive one block of data according to receive buffer size
-                block = sock.recv(buffer_size)
-                m += block
+def set_tcp_options(sock, nodelay=None, cork=None):
+    '''
+    :param sock: socket
+    :param nodelay: (Boolean) disable Nagle's algorithm, None to keep current value
+    :param cork: (Boolean) hold partial frames in the kernel until uncorked (Linux only), None to keep current value
+    '''
+    options = []
+    if nodelay is not None:
+        options.append((TCP_NODELAY, nodelay))
+    if cork is not None and TCP_CORK is not None:
+        options.append((TCP_CORK, cork))
 
-        except socket_error as (code, msg):
-            if code == 10054:
-                LOG.error('Server is not available.')
-            else:
-                LOG.error('Socket error occurred. Error code: %s, %s' % (code, msg))
-            return None
+    for option, value in options:
+        try:
+            sock.setsockopt(IPPROTO_TCP, option, int(value))
+        except socket_error as err:
+            # Not a TCP socket
+            LOG.debug('Can not set TCP option %s: %s' % (option, err))
+
+
+class FrameWriter(object):
+    def __init__(self, sock, nodelay=None, cork=False):
+        '''
+        Collect messages for the socket and send them together on flush
+        :param sock: socket
+        :param nodelay: (Boolean) value of TCP_NODELAY, None to keep the default
+        :param cork: (Boolean) cork the socket while flushing (only matters if sendmsg is not available)
+        '''
+        self.sock = sock
+        self.cork = cork
+        self.use_sendmsg = hasattr(sock, 'sendmsg')
+        self.tls = isinstance(sock, ssl.SSLSocket)
+        self.frames = []
+
+        # Several threads may write to the same client: the lock guards the queue (and the TLS
+        # connection, FrameReader takes it too), flushes go one after another under the send lock
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+
+        set_tcp_options(sock, nodelay=nodelay)
+
+    def queue(self, data):
+        '''
+        :param data: (list) message, it will be sent on the next flush
+        '''
+        frame = SEP.join([str(el) for el in data]).encode(ENCODING) + TERM_BYTES
+        with self.lock:
+            self.frames.append(frame)
+
+    def flush(self):
+        '''
+        Send all queued messages, with one sendmsg call if the socket supports it
+        :return: True if everything was sent
+        '''
+        with self.send_lock:
+            with self.lock:
+                frames, self.frames = self.frames, []
+            if not frames:
+                return True
+
+            try:
+                if self.cork:
+                    set_tcp_options(self.sock, cork=True)
+                self._send_frames(frames)
+                return True
+            except (socket_error, ValueError):
+                # ValueError - the socket was closed while waiting
+                return False
+            finally:
+                if self.cork:
+                    set_tcp_options(self.sock, cork=False)
+
+    def send(self, data):
+        '''
+        Queue the message and flush
+        :param data: (list)
+        :return: True if everything was sent
+        '''
+        self.queue(data)
+        return self.flush()
+
+    def _send_frames(self, frames):
+        if self.tls:
+            self._send_tls(b''.join(frames))
+            return
+
+        if not self.use_sendmsg:
+            self.sock.sendall(b''.join(frames))
+            return
+
+        buffers = [memoryview(frame) for frame in frames]
+        first = 0
+        while first < len(buffers):
+            try:
+                sent = self.sock.sendmsg(buffers[first:first + IOV_MAX])
+            except NotImplementedError:
+                # TLS sockets have sendmsg, but don't support it
+                self.use_sendmsg = False
+                self.sock.sendall(b''.join(buffers[first:]))
+                return
+
+            # Skip the frames which were sent completely, cut the one sent partially
+            while first < len(buffers) and sent >= len(buffers[first]):
+                sent -= len(buffers[first])
+                first += 1
+            if sent:
+                buffers[first] = buffers[first][sent:]
+
+
+    def _send_tls(self, data):
+        '''
+        Write without blocking while the lock is held, so the reader of the socket is not stopped
+        by the full buffer (otherwise two sides writing to each other could wait forever)
+        '''
+        data = memoryview(data)
+        while data:
+            with self.lock:
+                self.sock.setblocking(False)
+                try:
+                    sent = self.sock.send(data)
+                except (ssl.SSLWantWriteError, ssl.SSLWantReadError):
+                    sent = 0
+                finally:
+                    self.sock.setblocking(True)
+
+            data = data[sent:]
+            if data and not sent:
+                select.select([], [self.sock], [])
+
+
+class FrameReader(object):
+    def __init__(self, sock, buffer_size=BUFFER_SIZE, lock=None):
+        '''
+        Split the incoming stream into messages, keeping the data received after the current message
+        :param sock: socket
+        :param buffer_size: max possible size of message per one receive call
+        :param lock: lock of the FrameWriter of the same socket, TLS socket can't be read and written
+                     by two threads at once, so reads take it (plain sockets don't need it)
+        '''
+        self.sock = sock
+        self.buffer_size = buffer_size
+        self.buffer = bytearray()
+        self.lock = lock if isinstance(sock, ssl.SSLSocket) else None
+
+    def receive(self):
+        '''
+        :return: next message without terminate characters (None if connection is closed or broken)
+        '''
+        searched = 0  # part of the buffer which has no terminate characters
+        while 1:
+            end = self.buffer.find(TERM_BYTES, searched)
+            if end >= 0:
+                m = self.buffer[:end]
+                del self.buffer[:end + len(TERM_BYTES)]
+                return m.decode(ENCODING)
+            searched = max(0, len(self.buffer) - len(TERM_BYTES) + 1)
+
+            try:
+                # Check if there is data available before call recv
+                # (data already decrypted by TLS is not visible to select)
+                if not self._pending():
+                    ready, _, _ = select.select([self.sock], [], [])
+
+                    # Nothing is received yet
+                    if not ready:
+                        return None
 
-        # if m.endswith(TERM_CHAR) or len(block) <= 0:
-        if m.endswith(TERM_CHAR):
-            break
+                # Receive one block of data according to receive buffer size
+                block = self._recv()
+
+                # Only a part of the TLS record came, wait for the rest
+                if block is None:
+                    continue
+
+                # Connection closed by the other side
+                if not block:
+                    return None
+                self.buffer += block
+
+            except socket_error as err:
+                if err.errno in (errno.ECONNRESET, 10054):
+                    LOG.error('Server is not available.')
+                else:
+                    LOG.error('Socket error occurred. Error code: %s, %s' % (err.errno, err.strerror))
+                return None
 
-    # return m
-    return m[:-len(TERM_CHAR)]
+    def _pending(self):
+        pending = getattr(self.sock, 'pending', None)
+        return pending() if pending else 0
+
+    def _recv(self):
+        ''' :return: received data, None if the data is not complete yet (TLS only) '''
+        if self.lock is None:
+            return self.sock.recv(self.buffer_size)
+
+        # Writers wait for the lock, so the read must not block while holding it
+        with self.lock:
+            self.sock.setblocking(False)
+            try:
+                return self.sock.recv(self.buffer_size)
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return None
+            finally:
+                self.sock.setblocking(True)
 
 
 def parse_query(raw_data):
@@ -171,8 +379,11 @@ def close_socket(sock, log_msg=""):
     # Check if the socket is closed already
     # in this case there can be no I/O descriptor
     try:
-        sock.fileno()
+        closed = sock.fileno() == -1
     except socket_error:
+        closed = True
+
+    if closed:
         LOG.debug('Socket closed already ...')
         return
 
@@ -0,0 +1,185 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Replay store for finished games.
+
+    Every finished game is appended to a binary file as a fixed-size record,
+    so the N-th game always starts at HEADER_SIZE + N * RECORD_SIZE and the
+    file can be memory-mapped for random access.
+
+    File layout:
+        header: magic (4s), version (H), record size (H)
+        record: game_id (I), owner_id (I), opponent_id (I),
+                result (B), number of moves (B), moves (5s), padding (x)
+
+    Moves are cells 1-9, packed one per nibble (high nibble first),
+    so the whole 3x3 game fits into 5 bytes.
+'''
+
+# Setup Python logging --------------------------------------------------------
+import logging
+
+FORMAT = '%(asctime)-15s %(levelname)s %(message)s'
+logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+LOG = logging.getLogger()
+
+
+# Imports----------------------------------------------------------------------
+import os
+import mmap
+import struct
+import threading
+from protocol import enum, current_path
+
+
+# Common -----------------------------------------------------------------------
+REPLAY_FILE = os.path.join(current_path, "replays.bin")
+
+MAGIC = b"TTTR"
+VERSION = 1
+MAX_MOVES = 9
+MOVES_SIZE = (MAX_MOVES + 1) // 2  # 2 moves per byte
+
+HEADER_FORMAT = '<4sHH'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_FORMAT = '<IIIBB%dsx' % MOVES_SIZE
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+# Result of the finished game (owner always plays "X", opponent "O")
+GAME_RESULT = enum(
+    TIE=0,
+    OWNER_WON=1,
+    OPPONENT_WON=2
+)
+
+
+# Main functions ---------------------------------------------------------------
+def pack_moves(moves):
+    '''
+    :param moves: (list) cells 1-9 in the order they were taken
+    :return: (bytes) moves packed one per nibble
+    '''
+    nibbles = [int(m) for m in moves] + [0] * (MAX_MOVES + 1 - len(moves))
+    return bytes(nibbles[i] << 4 | nibbles[i + 1] for i in range(0, MAX_MOVES, 2))
+
+
+def unpack_moves(packed, n_moves):
+    '''
+    :param packed: (bytes) moves packed by pack_moves
+    :param n_moves: number of moves in the game
+    :return: (list) cells 1-9 in the order they were taken
+    '''
+    moves = []
+    for byte in packed:
+        moves.extend([byte >> 4, byte & 0x0F])
+    return moves[:n_moves]
+
+
+class ReplayStore(object):
+    def __init__(self, file_path=REPLAY_FILE):
+        ''' Open (or create) the replay file and build indexes over stored games '''
+        self.lock = threading.Lock()
+        self.file_path = file_path
+
+        self.by_game = {}  # in format <game_id>: record number
+        self.by_player = {}  # in format <player_id>: [game_id, ...]
+
+        self._mm = None
+        self._file = open(file_path, 'ab+')
+
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() == 0:
+            self._file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE))
+            self._file.flush()
+
+        self._remap()
+
+        magic, version, record_size = struct.unpack_from(HEADER_FORMAT, self._mm)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self.close()
+            raise ValueError("%s is not a replay file of version %d (version %s)" % (file_path, VERSION, version))
+
+        # Crash during append may leave a part of the last record, next records must start after the whole ones
+        size = HEADER_SIZE + self.count() * RECORD_SIZE
+        if len(self._mm) > size:
+            LOG.warning("Partial record (%d bytes) removed from the end of %s" % (len(self._mm) - size, file_path))
+            self._mm.close()
+            self._mm = None
+            self._file.truncate(size)
+            self._remap()
+
+        for record_n in range(self.count()):
+            game_id, owner_id, opponent_id = self._read(record_n)[:3]
+            self._index(record_n, game_id, owner_id, opponent_id)
+
+        LOG.info("Replay store opened, %d games loaded" % self.count())
+
+    def _remap(self):
+        ''' Map the file again, so records appended after the last mapping become visible '''
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _index(self, record_n, game_id, owner_id, opponent_id):
+        self.by_game[game_id] = record_n
+        for player_id in (owner_id, opponent_id):
+            self.by_player.setdefault(player_id, []).append(game_id)
+
+    def _read(self, record_n):
+        offset = HEADER_SIZE + record_n * RECORD_SIZE
+        return struct.unpack_from(RECORD_FORMAT, self._mm, offset)
+
+    def count(self):
+        ''' Number of games in the mapped part of the file '''
+        return (len(self._mm) - HEADER_SIZE) // RECORD_SIZE
+
+    def max_game_id(self):
+        return max(self.by_game.keys()) if self.by_game else 0
+
+    def append(self, game_id, owner_id, opponent_id, result, moves):
+        '''
+        :param game_id: id of the finished game
+        :param owner_id: id of the player who played "X"
+        :param opponent_id: id of the player who played "O"
+        :param result: GAME_RESULT
+        :param moves: (list) cells 1-9 in the order they were taken
+        '''
+        game_id, owner_id, opponent_id = int(game_id), int(owner_id), int(opponent_id)
+        record = struct.pack(RECORD_FORMAT, game_id, owner_id, opponent_id,
+                             result, len(moves), pack_moves(moves))
+
+        with self.lock:
+            self._file.write(record)
+            self._file.flush()
+            self._remap()
+            self._index(self.count() - 1, game_id, owner_id, opponent_id)
+
+    def get(self, game_id):
+        '''
+        :param game_id: id of the stored game
+        :return: (dict) stored game or None if there's no such game
+        '''
+        with self.lock:
+            record_n = self.by_game.get(int(game_id))
+            if record_n is None:
+                return None
+            game_id, owner_id, opponent_id, result, n_moves, packed = self._read(record_n)
+
+        return {
+            "game_id": game_id,
+            "owner_id": owner_id,
+            "opponent_id": opponent_id,
+            "result": result,
+            "moves": unpack_moves(packed, n_moves)
+        }
+
+    def games_of(self, player_id):
+        ''' Ids of the stored games in which player took part '''
+        with self.lock:
+            return list(self.by_player.get(int(player_id), []))
+
+    def close(self):
+        with self.lock:
+            self._mm.close()
+            self._file.close()
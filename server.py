@@ -1,4 +1,4 @@
-#! /usr/bin/env python
+#! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
 # Setup Python logging -------------------------------------------------------
@@ -10,44 +10,63 @@ LOG = logging.getLogger()
 
 
 # Imports----------------------------------------------------------------------
+import errno
 import threading
+from argparse import ArgumentParser  # Parsing command line arguments
+from timeit import default_timer as timer
 from protocol import *
-from socket import AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, socket, error as socket_error
+from replay import ReplayStore, GAME_RESULT, REPLAY_FILE
+from tournament import TournamentScheduler
+from transport import TcpTransport, make_transport, make_server_context, close_listener
+from socket import error as socket_error
 
 
 class Server(object):
-    def __init__(self):
-        ''' Initialize "sessions" queue to collect client sessions '''
+    def __init__(self, transport=None, replay_file=REPLAY_FILE):
+        '''
+        Initialize "sessions" queue to collect client sessions
+        :param transport: where to accept clients (TCP on the default address if not given)
+        :param replay_file: where finished games are stored
+        '''
+        self.transport = transport or TcpTransport()
+        self.listener = None
+        self.running = False
+
         self.sessions = {}
-        self.notifications = {}  # in format <player_id>: notification
+        self.notifications = {}  # in format <player_id>: [[command, data], ...]
         self.games = {}  # in format <game_id>: {name: x, game_started: (0/1), opponent_id: (int)/None}
-        
+        self.replays = ReplayStore(replay_file)  # finished games
+        self.tournaments = TournamentScheduler(self)
+
         self.lock = threading.Lock()
-        self.game_id = 1  # initial game_id
+        self.game_id = self.replays.max_game_id() + 1  # initial game_id (don't reuse ids of stored games)
+
+        # Functions called after each handled command as hook(command, elapsed_seconds)
+        self.timing_hooks = [self.update_command_stats]
+        self.command_stats = {}  # in format <command>: [calls, total seconds]
+        self.stats_lock = threading.Lock()  # separate from the game lock, stats are updated on every request
 
     def main_loop(self):
         ''' Main server loop. There server accepts clients and collect them into the session queue '''
         LOG.info('Application started and server socket created')
 
-        s = socket(AF_INET, SOCK_STREAM)
-        s.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-
         try:
-            s.bind((SERVER_INET_ADDR, SERVER_PORT))
-        except socket_error as (code, msg):
-            if code == 10048:
+            s = self.transport.listen()
+        except socket_error as err:
+            if err.errno in (errno.EADDRINUSE, 10048):
                 LOG.error("Server already started working..")
+            else:
+                LOG.error("Socket error - %s" % err)
             return
 
+        self.listener = s
+        self.running = True
         player_id = 1
 
         # Socket in the listening state
-        LOG.info("Waiting for a client connection...")
+        LOG.info("Waiting for a client connection on %s..." % self.transport)
 
-        # If we want to limit # of connections, then change 0 to # of possible connections
-        s.listen(0)
-
-        while True:
+        while self.running:
             try:
                 # Client connected
                 client_socket, addr = s.accept()
@@ -64,29 +83,123 @@ class Server(object):
                 LOG.info("Terminating by keyboard interrupt...")
                 break
             except socket_error as err:
-                LOG.error("Socket error - %s" % err)
+                if self.running:
+                    LOG.error("Socket error - %s" % err)
 
         # Terminating application
-        close_socket(s, 'Close server socket.')
+        self.running = False
+        close_listener(s)
+        LOG.debug('Close server socket.')
+
+    def stop(self):
+        ''' Stop accepting new clients, main_loop returns after that '''
+        self.running = False
+        if self.listener is not None:
+            close_listener(self.listener)
 
     def send_notifications(self):
-        '''Function to notify other clients about changes'''
+        '''
+        Function to notify other clients about changes.
+        Notifications are only queued, the caller flushes the writers.
+        :return: (set) writers which got new notifications
+        '''
+        with self.lock:
+            notifications, self.notifications = self.notifications, {}
+
+        writers = set()
+        for target_player_id, player_notifications in notifications.items():
+            target_thread = self.sessions.get(target_player_id)
+
+            # Player disconnected already
+            if target_thread is None:
+                continue
+
+            # Queue notifications to user
+            for command, data in player_notifications:
+                target_thread.writer.queue([command, RESP.OK, data])
+            writers.add(target_thread.writer)
+
+        return writers
+
+    def notify(self, player_id, command, data):
+        '''
+        Put notification into the queue, it's sent after the current request is handled
+        :param player_id: player to notify
+        :param command: COMMAND.NOTIFICATION
+        :param data: (string) data of the notification
+        '''
+        with self.lock:
+            self.notifications.setdefault(player_id, []).append([command, data])
+
+    def create_games(self, pairs):
+        '''
+        Create started games in one batch (used by tournaments)
+        :param pairs: (list) (owner_id, opponent_id) pairs
+        :return: (list) ids of the created games
+        '''
+        games = [new_game(owner_id, opponent_id) for owner_id, opponent_id in pairs]
+        empty_board = pack_data(games[0]["board"]) if games else ""
+
+        # The whole batch is added with one acquisition of the lock
+        with self.lock:
+            first_game_id = self.game_id
+            self.game_id += len(games)
+
+            game_ids = [str(game_id) for game_id in range(first_game_id, first_game_id + len(games))]
+            self.games.update(zip(game_ids, games))
+
+            # Both players learn the game id, owner ("X") moves first
+            for game_id, (owner_id, opponent_id) in zip(game_ids, pairs):
+                self.notifications.setdefault(owner_id, []).extend([
+                    [COMMAND.NOTIFICATION.GAME_ASSIGNED, game_id],
+                    [COMMAND.NOTIFICATION.YOUR_TURN, empty_board]
+                ])
+                self.notifications.setdefault(opponent_id, []).append([COMMAND.NOTIFICATION.GAME_ASSIGNED, game_id])
 
-        while self.notifications:
-            # Each change was packed in the following format [command, [arg1, arg2, arg_n]]
-            target_player_id = list(self.notifications.keys())[0]
-            command, game_id = self.notifications[target_player_id]
+        return game_ids
 
-            board = self.games[game_id]["board"]
-            data = pack_data(board)
+    def remove_session(self, player_id):
+        '''
+        Forget the disconnected player, his tournament games are forfeited
+        :param player_id: id of the disconnected player
+        '''
+        with self.lock:
+            self.sessions.pop(player_id, None)
+
+        self.tournaments.leave(player_id)
+
+    def mark_finished(self, game_id):
+        '''
+        Finish the game without a move (forfeit), nobody can move in it after that
+        :param game_id: id of the game
+        :return: (Boolean) True if the game was in progress
+        '''
+        with self.lock:
+            game = self.games[game_id]
+            if game["game_finished"]:
+                return False
+            game["game_finished"] = 1
+            return True
 
-            del self.notifications[target_player_id]
+    def update_command_stats(self, command, elapsed):
+        ''' Default timing hook, collects number of calls and total time per command '''
+        with self.stats_lock:
+            stats = self.command_stats.setdefault(command, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
 
-            target_thread = self.sessions[target_player_id]
+    def finish_game(self, game_id, result):
+        '''
+        Save the finished game into the replay store.
+        Called once per game, by the one who marked it finished (see on_make_move)
+        :param game_id: id of the finished game
+        :param result: GAME_RESULT
+        '''
+        game = self.games[game_id]
+        self.replays.append(game_id, game["owner_id"], game["opponent_id"], result, game["moves"])
+        LOG.debug("Game %s finished and saved for replay" % game_id)
 
-            # Send notification to user
-            tcp_send(target_thread.client_sock, [command, RESP.OK, data])
-            # t.notify(command)
+        self.tournaments.on_game_end(game_id, result)
 
 
 # Main handler ---------------------------------------------------
@@ -98,18 +211,47 @@ class ClientSession(threading.Thread):
         self.server = server  # Server object
         self.player_id = str(player_id)
 
+        self.writer = FrameWriter(client_sock, nodelay=NODELAY)
+        self.reader = FrameReader(client_sock, lock=self.writer.lock)  # other sessions write while it reads
+
     def run(self):
         global dir_files, lock
 
         current_thread = threading.current_thread()
-        connection_n = current_thread.getName().split("-")[1]
+        connection_n = current_thread.name.split("-")[1]
         current_thread.socket = self.client_sock
 
         LOG.debug("Client %s connected:" % connection_n)
-        LOG.debug("Client's socket info : %s:%d:" % self.client_sock.getsockname())
+        LOG.debug("Client's socket info : %s" % (self.client_sock.getsockname(),))
+
+        # Socket is closed and the player's games are forfeited however the session ends
+        try:
+            self.serve(connection_n)
+        except Exception:
+            LOG.exception("Client(%s) session failed" % connection_n)
+        finally:
+            with self.writer.lock:
+                close_socket(self.client_sock, 'Close client socket.')
+
+            # Opponents of the player get his forfeits right away
+            self.server.remove_session(self.player_id)
+            for writer in self.server.send_notifications():
+                writer.flush()
+
+    def serve(self, connection_n):
+        ''' Handle requests of the client until he disconnects '''
+        # TLS handshake (if the connection is encrypted) is done in the client's thread
+        do_handshake = getattr(self.client_sock, 'do_handshake', None)
+        if do_handshake is not None:
+            try:
+                with self.writer.lock:
+                    do_handshake()
+            except socket_error as err:
+                LOG.error("Client(%s) TLS handshake failed - %s" % (connection_n, err))
+                return
 
         while True:
-            msg = tcp_receive(self.client_sock)
+            msg = self.reader.receive()
 
             # Msg received successfully
             if msg:
@@ -121,114 +263,47 @@ class ClientSession(threading.Thread):
                 LOG.debug("Client(%s) closed the connection" % connection_n)
                 break
 
-            resp_code, sending_data = RESP.OK, ""
-
-            #######################
-            # Actions on commands
-            if command == COMMAND.START_NEW_GAME:
-                with self.server.lock:
-                    game_id = str(self.server.game_id)
-
-                    # Create new game
-                    self.server.games[game_id] = {
-                        # "id": str(game_id),
-                        "game_started": 0,
-                        "owner_id": self.player_id,
-                        "opponent_id": None,
-                        "board": [' '] * 10
-                    }
-                    self.server.game_id += 1
-                sending_data = game_id
-
-            elif command == COMMAND.JOIN_GAME:
-                game_id = data
-
-                if game_id not in self.server.games.keys():
-                    resp_code = RESP.GAME_DOES_NOT_EXIST
-
-                elif self.server.games[game_id]["game_started"]:
-                    resp_code = RESP.GAME_ALREADY_STARTED
-
-                # Assign this player as opponent to the game and notify admin that the game started
-                else:
-                    with self.server.lock:
-                        self.server.games[game_id]["game_started"] = 1
-                        self.server.games[game_id]["opponent_id"] = self.player_id
-                    owner_id = self.server.games[game_id]["owner_id"]
-
-                    # Put notification about player's turn into the queue
-                    self.server.notifications[owner_id] = [COMMAND.NOTIFICATION.YOUR_TURN, game_id]
-
-                    sending_data = game_id
-
-            elif command == COMMAND.GAMES_LIST:
-                try:
-                    # Show only the games which have not started yet
-                    sending_data = pack_data(
-                        [game_id for game_id, game in self.server.games.items() if not game["game_started"]])
-                except KeyError:
-                    sending_data = ""
-
-            elif command == COMMAND.MAKE_MOVE:
-                game_id, move = parse_data(data)
-
-                board = self.server.games[game_id]["board"]
-
-                # Owner will always have "X" and opponent "O"
-                if self.server.games[game_id]["owner_id"] == self.player_id:
-                    player_letter = 'X'
-                    next_player_id = self.server.games[game_id]["opponent_id"]
-                    # winner_id, loser_id = self.player_id, next_player_id
-                else:
-                    player_letter = 'O'
-                    next_player_id = self.server.games[game_id]["owner_id"]
-                    # winner_id, loser_id = next_player_id, self.player_id
-
-                opponent_letter = 'O' if player_letter == 'X' else 'X'
-
-                # If the space is free and move is valid, then save move
-                if self.is_space_free(board, move) and move in '1 2 3 4 5 6 7 8 9'.split():
-                    move = int(move)
-
-                    board[move] = player_letter
-                    sending_data = pack_data(board)
-
-                    # If current player is winner, notify him that he lost and I won
-                    if self.is_winner(board, player_letter):
-                        self.server.notifications[self.player_id] = [COMMAND.NOTIFICATION.YOU_WON, game_id]
-                        self.server.notifications[next_player_id] = [COMMAND.NOTIFICATION.YOU_LOST, game_id]
-
-                    # If opponent is winner, notify him that he won and me that I lost
-                    elif self.is_winner(board, opponent_letter):
-                        self.server.notifications[next_player_id] = [COMMAND.NOTIFICATION.YOU_WON, game_id]
-                        self.server.notifications[self.player_id] = [COMMAND.NOTIFICATION.YOU_LOST, game_id]
-
-                    # Notify both players that game is a tie
-                    elif self.is_board_full(board):
-                        self.server.notifications[self.player_id] = [COMMAND.NOTIFICATION.GAME_IS_A_TIE, game_id]
-                        self.server.notifications[next_player_id] = [COMMAND.NOTIFICATION.GAME_IS_A_TIE, game_id]
-
-                    else:
-                        # Notify next player about his move
-                        self.server.notifications[next_player_id] = [COMMAND.NOTIFICATION.YOUR_TURN, game_id]
-
-                # Otherwise player should make a move again
-                # because move is invalid
-                else:
-                    resp_code = RESP.MOVE_IS_INVALID
-
-            # Send response on requested command
-            res = tcp_send(self.client_sock, [command, resp_code, sending_data])
+            resp_code, sending_data = self.dispatch(command, data)
 
-            # Case: some problem with receiving data
+            # Queue response on requested command
+            self.writer.queue([command, resp_code, sending_data])
+
+            # Trigger notify_clients function (if there're some changes in the queue, it will process them)
+            writers = self.server.send_notifications()
+
+            # Response and notifications to this client leave in one send, other clients get one send each
+            res = self.writer.flush()
+            for writer in writers - {self.writer}:
+                writer.flush()
+
+            # Case: some problem with sending data
             if not res:
-                LOG.debug("Client(%s, %s) closed the connection" % self.client_sock.getsockname())
+                LOG.debug("Client(%s) closed the connection" % connection_n)
                 break
 
-            # Trigger notify_clients function (if there're some changes in the queue, it will process them)
-            self.server.send_notifications()
+    def dispatch(self, command, data):
+        '''
+        Call the registered handler of the command and report its time to the timing hooks
+        :param command: command from the client
+        :param data: data of the request
+        :return: (resp_code, sending_data)
+        '''
+        command_handler = HANDLERS.get(command)
+        if command_handler is None:
+            LOG.error("Unknown command %s" % command)
+            return RESP.FAIL, ""
 
-        close_socket(self.client_sock, 'Close client socket.')
+        started = timer()
+        try:
+            return command_handler(self, data)
+        except Exception:
+            # Broken request (e.g. unknown game or wrong data) fails, the session goes on
+            LOG.exception("Client's request %s|%s failed" % (command, data[:20]))
+            return RESP.FAIL, ""
+        finally:
+            elapsed = timer() - started
+            for hook in self.server.timing_hooks:
+                hook(command, elapsed)
 
     def is_space_free(self, board, i):
         return board[int(i)] == ' '
@@ -248,20 +323,248 @@ class ClientSession(threading.Thread):
         '''
         # Given a board and a player's letter, this function returns True if that player has won.
         # We use bo instead of board and le instead of letter so we don't have to type as much.
-        return ((bo[7] == le and bo[8] == le and bo[9] == le) or  # across the top
-                (bo[4] == le and bo[5] == le and bo[6] == le) or  # across the middle
-                (bo[1] == le and bo[2] == le and bo[3] == le) or  # across the bottom
-                (bo[7] == le and bo[4] == le and bo[1] == le) or  # down the left side
-                (bo[8] == le and bo[5] == le and bo[2] == le) or  # down the middle
-                (bo[9] == le and bo[6] == le and bo[3] == le) or  # down the right side
-                (bo[7] == le and bo[5] == le and bo[3] == le) or  # diagonal
-                (bo[9] == le and bo[5] == le and bo[1] == le))    # diagonal
-
-
-def main():
-    server = Server()
+        return any(bo[a] == le and bo[b] == le and bo[c] == le for a, b, c in WIN_LINES)
+
+
+def new_game(owner_id, opponent_id=None):
+    '''
+    :param owner_id: player who plays "X"
+    :param opponent_id: player who plays "O" (None until somebody joins the game)
+    :return: (dict) game, it's started if both players are known
+    '''
+    return {
+        "game_started": int(opponent_id is not None),
+        "game_finished": 0,
+        "owner_id": owner_id,
+        "opponent_id": opponent_id,
+        "board": [' '] * 10,
+        "moves": []
+    }
+
+
+# Command handlers -------------------------------------------------------------
+# in format <command>: handler(session, data) -> (resp_code, sending_data)
+HANDLERS = {}
+
+
+def handler(command):
+    ''' Decorator to register the function as the handler of the command '''
+    def register(func):
+        HANDLERS[command] = func
+        return func
+    return register
+
+
+@handler(COMMAND.START_NEW_GAME)
+def on_start_new_game(session, data):
+    ''' Create a new game, player who created it becomes the owner ("X") '''
+    resp_code, sending_data = RESP.OK, ""
+
+    with session.server.lock:
+        game_id = str(session.server.game_id)
+
+        # Create new game
+        session.server.games[game_id] = new_game(session.player_id)
+        session.server.game_id += 1
+    sending_data = game_id
+
+    return resp_code, sending_data
+
+
+@handler(COMMAND.JOIN_GAME)
+def on_join_game(session, data):
+    ''' Join a game which has not started yet as the opponent ("O") '''
+    resp_code, sending_data = RESP.OK, ""
+
+    game_id = data
+
+    if game_id not in session.server.games.keys():
+        resp_code = RESP.GAME_DOES_NOT_EXIST
+
+    elif session.server.games[game_id]["game_started"]:
+        resp_code = RESP.GAME_ALREADY_STARTED
+
+    # Assign this player as opponent to the game and notify admin that the game started
+    else:
+        with session.server.lock:
+            session.server.games[game_id]["game_started"] = 1
+            session.server.games[game_id]["opponent_id"] = session.player_id
+        owner_id = session.server.games[game_id]["owner_id"]
+
+        # Put notification about player's turn into the queue
+        board = session.server.games[game_id]["board"]
+        session.server.notify(owner_id, COMMAND.NOTIFICATION.YOUR_TURN, pack_data(board))
+
+        sending_data = game_id
+
+    return resp_code, sending_data
+
+
+@handler(COMMAND.GAMES_LIST)
+def on_games_list(session, data):
+    ''' Ids of the games which have not started yet '''
+    resp_code, sending_data = RESP.OK, ""
+
+    try:
+        # Show only the games which have not started yet
+        sending_data = pack_data(
+            [game_id for game_id, game in session.server.games.items() if not game["game_started"]])
+    except KeyError:
+        sending_data = ""
+
+    return resp_code, sending_data
+
+
+@handler(COMMAND.MAKE_MOVE)
+def on_make_move(session, data):
+    ''' Put the letter of the player on the board and notify players about the result '''
+    resp_code, sending_data = RESP.OK, ""
+
+    game_id, move = parse_data(data)
+
+    game = session.server.games[game_id]
+    board = game["board"]
+
+    # Move, its result and the end of the game are one step, so nobody can move after the last move
+    result = None
+    with session.server.lock:
+        # Owner will always have "X" and opponent "O", "X" moves first and then they take turns
+        # (replays keep only the cells, letters come from the order of the moves)
+        player_letter = 'X' if len(game["moves"]) % 2 == 0 else 'O'
+        opponent_letter = 'O' if player_letter == 'X' else 'X'
+        if player_letter == 'X':
+            turn_player_id, next_player_id = game["owner_id"], game["opponent_id"]
+        else:
+            turn_player_id, next_player_id = game["opponent_id"], game["owner_id"]
+
+        # If the game is in progress, it's the turn of the player (so he plays in this game),
+        # the space is free and move is valid, then save move
+        is_valid = game["game_started"] and not game["game_finished"] and \
+            session.player_id == turn_player_id and \
+            move in '1 2 3 4 5 6 7 8 9'.split() and session.is_space_free(board, move)
+
+        if is_valid:
+            move = int(move)
+
+            board[move] = player_letter
+            game["moves"].append(move)
+            sending_data = pack_data(board)
+
+            if session.is_winner(board, player_letter):
+                result = GAME_RESULT.OWNER_WON if player_letter == 'X' else GAME_RESULT.OPPONENT_WON
+            elif session.is_winner(board, opponent_letter):
+                result = GAME_RESULT.OWNER_WON if opponent_letter == 'X' else GAME_RESULT.OPPONENT_WON
+            elif session.is_board_full(board):
+                result = GAME_RESULT.TIE
+
+            game["game_finished"] = int(result is not None)
+
+    # Otherwise player should make a move again
+    # because move is invalid (or the game is over)
+    if not is_valid:
+        resp_code = RESP.MOVE_IS_INVALID
+
+    # Notify next player about his move
+    elif result is None:
+        session.server.notify(next_player_id, COMMAND.NOTIFICATION.YOUR_TURN, sending_data)
+
+    # Notify both players that game is a tie
+    elif result == GAME_RESULT.TIE:
+        session.server.notify(session.player_id, COMMAND.NOTIFICATION.GAME_IS_A_TIE, sending_data)
+        session.server.notify(next_player_id, COMMAND.NOTIFICATION.GAME_IS_A_TIE, sending_data)
+        session.server.finish_game(game_id, result)
+
+    # Notify the winner that he won and the other player that he lost
+    else:
+        winner_id, loser_id = game["owner_id"], game["opponent_id"]
+        if result == GAME_RESULT.OPPONENT_WON:
+            winner_id, loser_id = loser_id, winner_id
+
+        session.server.notify(winner_id, COMMAND.NOTIFICATION.YOU_WON, sending_data)
+        session.server.notify(loser_id, COMMAND.NOTIFICATION.YOU_LOST, sending_data)
+        session.server.finish_game(game_id, result)
+
+    return resp_code, sending_data
+
+
+@handler(COMMAND.GET_REPLAY)
+def on_get_replay(session, data):
+    ''' Moves of the finished game from the replay store '''
+    resp_code, sending_data = RESP.OK, ""
+
+    game_id = data
+    game = session.server.replays.get(game_id) if game_id.isdigit() else None
+
+    if game is None:
+        resp_code = RESP.GAME_DOES_NOT_EXIST
+
+    # Moves in the order they were made, owner ("X") always moves first
+    else:
+        sending_data = pack_data(game["moves"])
+
+    return resp_code, sending_data
+
+
+@handler(COMMAND.REGISTER_TOURNAMENT)
+def on_register_tournament(session, data):
+    ''' Register the player for the next tournament '''
+    resp_code, sending_data = RESP.OK, ""
+
+    sending_data = session.server.tournaments.register(session.player_id)
+
+    return resp_code, sending_data
+
+
+@handler(COMMAND.START_TOURNAMENT)
+def on_start_tournament(session, data):
+    '''
+    Start the tournament for all registered players, data is "format" or "format:)rounds".
+    Response is "tournament_id:)rounds" (rounds may be less than requested, see Tournament)
+    '''
+    resp_code, sending_data = RESP.OK, ""
+
+    args = parse_data(data)
+    tournament_format = args[0]
+    rounds = args[1] if len(args) > 1 else ""
+
+    if tournament_format not in (TOURNAMENT_FORMAT.ROUND_ROBIN, TOURNAMENT_FORMAT.SWISS) or \
+            (rounds and not rounds.isdigit()):
+        resp_code = RESP.FAIL
+
+    else:
+        tournament = session.server.tournaments.start(tournament_format, int(rounds) if rounds else None)
+
+        # Not enough registered players
+        if tournament is None:
+            resp_code = RESP.FAIL
+        else:
+            sending_data = pack_data([tournament.id, tournament.rounds])
+
+    return resp_code, sending_data
+
+
+def main(args):
+    tls_context = make_server_context(args.certfile, args.keyfile) if args.certfile else None
+    server = Server(make_transport(args.host, args.port, args.unix, tls_context))
     server.main_loop()
 
 
 if __name__ == '__main__':
-    main()
+    # Parsing arguments
+    parser = ArgumentParser(description=info())
+    parser.add_argument('-H', '--host',
+                        help='Server INET address (to listen), '
+                             'defaults to %s' % SERVER_INET_ADDR,
+                        default=SERVER_INET_ADDR)
+    parser.add_argument('-p', '--port', type=int,
+                        help='Server TCP port (to listen), '
+                             'defaults to %d' % SERVER_PORT,
+                        default=SERVER_PORT)
+    parser.add_argument('-u', '--unix',
+                        help='Path of the unix domain socket to listen instead of TCP')
+    parser.add_argument('--certfile',
+                        help='Server certificate (PEM), enables TLS')
+    parser.add_argument('--keyfile',
+                        help='Server private key (PEM), if it is not in the certfile')
+    args = parser.parse_args()
+    main(args)
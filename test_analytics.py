@@ -0,0 +1,91 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tests of the vectorized game evaluation against a plain Python one.
+
+    Run with: python -m unittest test_analytics  (or python -m pytest)
+'''
+
+# Imports----------------------------------------------------------------------
+import random
+import unittest
+from protocol import WIN_LINES
+from replay import GAME_RESULT, MAX_MOVES
+
+try:
+    import numpy as np
+    import analytics
+except ImportError:
+    np = None  # analytics needs NumPy
+
+
+# Common -----------------------------------------------------------------------
+def play_random_game(rnd):
+    ''' Moves of a game between two random players, until somebody wins or the board is full '''
+    cells = list(range(1, 10))
+    rnd.shuffle(cells)
+    board = [None] * 10
+    moves = []
+    for k, cell in enumerate(cells):
+        board[cell] = 'X' if k % 2 == 0 else 'O'
+        moves.append(cell)
+        if any(all(board[i] == board[cell] for i in line) for line in WIN_LINES):
+            break
+    return moves
+
+
+def check_game(moves):
+    '''
+    Plain Python version of analytics.evaluate for one game
+    :return: (result, valid)
+    '''
+    board = [None] * 10
+    for k, cell in enumerate(moves):
+        if not 1 <= cell <= 9 or board[cell] is not None:
+            return GAME_RESULT.TIE, False
+
+        letter = 'X' if k % 2 == 0 else 'O'
+        board[cell] = letter
+        if any(all(board[i] == letter for i in line) for line in WIN_LINES):
+            result = GAME_RESULT.OWNER_WON if letter == 'X' else GAME_RESULT.OPPONENT_WON
+            return result, k == len(moves) - 1  # nothing can be played after the win
+
+    return GAME_RESULT.TIE, len(moves) == MAX_MOVES
+
+
+# Tests ------------------------------------------------------------------------
+@unittest.skipIf(np is None, "NumPy is not installed")
+class AnalyticsTest(unittest.TestCase):
+    def test_evaluate(self):
+        rnd = random.Random(2)
+        games = [play_random_game(rnd) for _ in range(2000)]
+
+        # Broken records: taken cells, moves after the win, too short games, cells out of the board
+        for moves in games[::10]:
+            k = rnd.randrange(len(moves))
+            choice = rnd.randrange(4)
+            if choice == 0 and k:
+                moves[k] = moves[k - 1]
+            elif choice == 1 and len(moves) < MAX_MOVES:
+                moves.append(next(cell for cell in range(1, 10) if cell not in moves))
+            elif choice == 2:
+                del moves[k:]
+            else:
+                moves[k] = rnd.choice([10, 15])
+
+        moves = np.zeros((len(games), MAX_MOVES), dtype=np.uint8)
+        for game_n, game in enumerate(games):
+            moves[game_n, :len(game)] = game
+        n_moves = np.array([len(game) for game in games], dtype=np.uint8)
+
+        results, valid = analytics.evaluate(moves, n_moves)
+        for game_n, game in enumerate(games):
+            result, is_valid = check_game(game)
+            self.assertEqual(bool(valid[game_n]), is_valid, game)
+            if is_valid:
+                self.assertEqual(results[game_n], result, game)
+
+
+if __name__ == '__main__':
+    unittest.main()
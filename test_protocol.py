@@ -0,0 +1,156 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tests of the message framing, plain and over TLS.
+
+    Run with: python -m unittest test_protocol  (or python -m pytest)
+'''
+
+# Imports----------------------------------------------------------------------
+import shutil
+import tempfile
+import threading
+import unittest
+from socket import socketpair
+from protocol import *
+from transport import make_server_context, make_client_context
+from benchmark_tls import generate_certificate
+
+
+# Common -----------------------------------------------------------------------
+TLS_HOST = "127.0.0.1"
+
+
+class PartialSocket(object):
+    def __init__(self, max_bytes):
+        ''' Socket which sends at most max_bytes per sendmsg call '''
+        self.max_bytes = max_bytes
+        self.data = bytearray()
+        self.calls = []  # number of buffers in every sendmsg call
+
+    def sendmsg(self, buffers):
+        self.calls.append(len(buffers))
+        sent = b''.join(bytes(buf) for buf in buffers)[:self.max_bytes]
+        self.data += sent
+        return len(sent)
+
+    def setsockopt(self, level, option, value):
+        pass
+
+
+# Tests ------------------------------------------------------------------------
+class FrameWriterTest(unittest.TestCase):
+    def frames(self, messages):
+        return b''.join(SEP.join(message).encode(ENCODING) + TERM_BYTES for message in messages)
+
+    def test_coalescing(self):
+        sock = PartialSocket(max_bytes=1 << 20)
+        writer = FrameWriter(sock)
+        messages = [[COMMAND.MAKE_MOVE, RESP.OK, str(i)] for i in range(3)]
+        for message in messages:
+            writer.queue(message)
+
+        self.assertTrue(writer.flush())
+        self.assertEqual(sock.calls, [3])
+        self.assertEqual(bytes(sock.data), self.frames(messages))
+
+        # Nothing queued, nothing sent
+        self.assertTrue(writer.flush())
+        self.assertEqual(sock.calls, [3])
+
+    def test_partial_sends(self):
+        messages = [[COMMAND.GAMES_LIST, RESP.OK, "x" * i] for i in range(0, 40, 3)]
+        for max_bytes in (1, 5, 7, 16, 100):
+            sock = PartialSocket(max_bytes)
+            writer = FrameWriter(sock)
+            for message in messages:
+                writer.queue(message)
+
+            self.assertTrue(writer.flush())
+            self.assertEqual(bytes(sock.data), self.frames(messages), max_bytes)
+
+    def test_iov_max(self):
+        sock = PartialSocket(max_bytes=1 << 20)
+        writer = FrameWriter(sock)
+        messages = [[COMMAND.GAMES_LIST, RESP.OK, str(i)] for i in range(IOV_MAX + 5)]
+        for message in messages:
+            writer.queue(message)
+
+        self.assertTrue(writer.flush())
+        self.assertEqual(sock.calls, [IOV_MAX, 5])
+        self.assertEqual(bytes(sock.data), self.frames(messages))
+
+    def test_frames_arrive_together(self):
+        server_end, client_end = socketpair()
+        try:
+            writer, reader = FrameWriter(server_end), FrameReader(client_end, buffer_size=7)
+            messages = [[COMMAND.MAKE_MOVE, RESP.OK, pack_data([i, "x" * i])] for i in range(20)]
+            for message in messages:
+                writer.queue(message)
+            self.assertTrue(writer.flush())
+
+            for message in messages:
+                self.assertEqual(reader.receive(), SEP.join(message))
+        finally:
+            server_end.close()
+            client_end.close()
+
+
+@unittest.skipIf(shutil.which("openssl") is None, "openssl is needed to generate the certificate")
+class TlsFramingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        certfile, keyfile = generate_certificate(self.directory, TLS_HOST)
+
+        server_end, client_end = socketpair()
+        self.socks = [
+            make_server_context(certfile, keyfile).wrap_socket(server_end, server_side=True,
+                                                               do_handshake_on_connect=False),
+            make_client_context(certfile).wrap_socket(client_end, server_hostname=TLS_HOST,
+                                                      do_handshake_on_connect=False)
+        ]
+
+        handshakes = [threading.Thread(target=sock.do_handshake) for sock in self.socks]
+        for thread in handshakes:
+            thread.start()
+        for thread in handshakes:
+            thread.join()
+
+    def tearDown(self):
+        for sock in self.socks:
+            close_socket(sock)
+        shutil.rmtree(self.directory)
+
+    def test_read_and_write_from_two_threads(self):
+        n_messages = 500
+        received = [[], []]
+
+        def read(end, reader):
+            for _ in range(n_messages):
+                received[end].append(reader.receive())
+
+        def write(end, writer):
+            for i in range(n_messages):
+                writer.send([COMMAND.NOTIFICATION.YOUR_TURN, RESP.OK, "%d-%d" % (end, i)])
+
+        # Every end is read by one thread and written by another one at the same time
+        threads = []
+        for end, sock in enumerate(self.socks):
+            writer = FrameWriter(sock)
+            reader = FrameReader(sock, lock=writer.lock)
+            threads.append(threading.Thread(target=read, args=(end, reader)))
+            threads.append(threading.Thread(target=write, args=(end, writer)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for end in range(2):
+            other = 1 - end
+            self.assertEqual(received[end], [SEP.join([COMMAND.NOTIFICATION.YOUR_TURN, RESP.OK, "%d-%d" % (other, i)])
+                                             for i in range(n_messages)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tests of the replay store.
+
+    Run with: python -m unittest test_replay  (or python -m pytest)
+'''
+
+# Imports----------------------------------------------------------------------
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+from replay import ReplayStore, GAME_RESULT, MAX_MOVES, MAGIC, VERSION, HEADER_FORMAT, HEADER_SIZE, RECORD_SIZE, \
+    pack_moves, unpack_moves
+
+
+# Tests ------------------------------------------------------------------------
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.directory, "replays.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pack_unpack_moves(self):
+        rnd = random.Random(1)
+        for n_moves in range(MAX_MOVES + 1):
+            moves = rnd.sample(range(1, 10), n_moves)
+            self.assertEqual(unpack_moves(pack_moves(moves), n_moves), moves)
+
+    def test_reopen_store(self):
+        store = ReplayStore(self.file_path)
+        store.append(1, 10, 20, GAME_RESULT.OWNER_WON, [7, 4, 8, 5, 9])
+        store.append(2, 20, 30, GAME_RESULT.TIE, [5, 1, 9, 3, 2, 8, 4, 6, 7])
+        store.close()
+
+        store = ReplayStore(self.file_path)
+        try:
+            self.assertEqual(store.count(), 2)
+            self.assertEqual(store.max_game_id(), 2)
+            self.assertEqual(store.get(1), {"game_id": 1, "owner_id": 10, "opponent_id": 20,
+                                            "result": GAME_RESULT.OWNER_WON, "moves": [7, 4, 8, 5, 9]})
+            self.assertEqual(store.get("2")["moves"], [5, 1, 9, 3, 2, 8, 4, 6, 7])
+            self.assertEqual(store.games_of(20), [1, 2])
+            self.assertIsNone(store.get(3))
+        finally:
+            store.close()
+
+    def test_partial_record_is_removed(self):
+        store = ReplayStore(self.file_path)
+        store.append(1, 10, 20, GAME_RESULT.OWNER_WON, [7, 4, 8, 5, 9])
+        store.close()
+
+        # Crash in the middle of the second record
+        with open(self.file_path, 'ab') as f:
+            f.write(b"\x02\x00\x00")
+
+        store = ReplayStore(self.file_path)
+        try:
+            self.assertEqual(os.path.getsize(self.file_path), HEADER_SIZE + RECORD_SIZE)
+            store.append(2, 20, 30, GAME_RESULT.OPPONENT_WON, [1, 5, 2, 3, 4, 7])
+            self.assertEqual(store.count(), 2)
+            self.assertEqual(store.get(2)["moves"], [1, 5, 2, 3, 4, 7])
+        finally:
+            store.close()
+
+    def test_other_version_is_rejected(self):
+        with open(self.file_path, 'wb') as f:
+            f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION + 1, RECORD_SIZE))
+
+        with self.assertRaises(ValueError):
+            ReplayStore(self.file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
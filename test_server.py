@@ -0,0 +1,190 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tests of the server, clients connect over the in-process transport.
+
+    Run with: python -m unittest test_server  (or python -m pytest)
+'''
+
+# Imports----------------------------------------------------------------------
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from protocol import *
+from replay import GAME_RESULT
+from transport import SocketPairTransport
+from server import Server
+
+
+# Common -----------------------------------------------------------------------
+def expect(reader, command):
+    ''' Receive messages until the one with the command, return (resp_code, data) '''
+    while True:
+        m = reader.receive()
+        if m is None:
+            raise AssertionError("Connection closed while waiting for %s" % command)
+        resp_command, resp_code, data = parse_response(m)
+        if resp_command == command:
+            return resp_code, data
+
+
+# Tests ------------------------------------------------------------------------
+class ServerTestCase(unittest.TestCase):
+    ''' Server running in its own thread with a temporary replay file '''
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.transport = SocketPairTransport()
+        self.server = Server(self.transport, replay_file=os.path.join(self.directory, "replays.bin"))
+
+        self.server_thread = threading.Thread(name='TestServer', target=self.server.main_loop)
+        self.server_thread.start()
+        while not self.server.running:
+            threading.Event().wait(0.01)
+
+        self.socks = []
+
+    def tearDown(self):
+        for sock in self.socks:
+            self.transport.close(sock)
+        self.server.stop()
+        self.server_thread.join()
+        self.server.replays.close()
+        shutil.rmtree(self.directory)
+
+    def connect(self):
+        sock = self.transport.connect()
+        self.socks.append(sock)
+        return sock, FrameReader(sock)
+
+
+class SessionTest(ServerTestCase):
+    def test_broken_request_ends_session(self):
+        sock, reader = self.connect()
+        tcp_send(sock, [COMMAND.START_NEW_GAME, ""])
+        expect(reader, COMMAND.START_NEW_GAME)
+        session = self.server.sessions["1"]
+
+        # Frame without the separator can't be parsed
+        sock.sendall(b"garbage" + TERM_BYTES)
+        self.assertIsNone(reader.receive())
+
+        session.join()
+        self.assertNotIn("1", self.server.sessions)
+
+
+class DispatchTest(ServerTestCase):
+    def test_unknown_command(self):
+        sock, reader = self.connect()
+        tcp_send(sock, ["99", ""])
+        self.assertEqual(expect(reader, "99"), (RESP.FAIL, ""))
+        self.assertNotIn("99", self.server.command_stats)
+
+    def test_failed_handler(self):
+        sock, reader = self.connect()
+
+        # No such game, no cell in the data
+        for data in (pack_data(["999", 5]), "1"):
+            tcp_send(sock, [COMMAND.MAKE_MOVE, data])
+            self.assertEqual(expect(reader, COMMAND.MAKE_MOVE), (RESP.FAIL, ""))
+
+        # Session is still alive
+        tcp_send(sock, [COMMAND.START_NEW_GAME, ""])
+        self.assertEqual(expect(reader, COMMAND.START_NEW_GAME)[0], RESP.OK)
+
+    def test_timing_hooks(self):
+        timings = []
+        self.server.timing_hooks.append(lambda command, elapsed: timings.append((command, elapsed)))
+
+        sock, reader = self.connect()
+        for command in (COMMAND.START_NEW_GAME, COMMAND.GAMES_LIST, COMMAND.GAMES_LIST):
+            tcp_send(sock, [command, ""])
+            expect(reader, command)
+
+        self.assertEqual([command for command, _ in timings],
+                         [COMMAND.START_NEW_GAME, COMMAND.GAMES_LIST, COMMAND.GAMES_LIST])
+        self.assertTrue(all(elapsed >= 0 for _, elapsed in timings))
+        self.assertEqual(self.server.command_stats[COMMAND.GAMES_LIST][0], 2)
+        self.assertEqual(self.server.command_stats[COMMAND.START_NEW_GAME][0], 1)
+
+
+class GameTest(ServerTestCase):
+    def start_game(self):
+        ''' :return: game_id, (owner_sock, owner reader), (opponent_sock, opponent reader) '''
+        owner_sock, owner = self.connect()
+        opponent_sock, opponent = self.connect()
+
+        tcp_send(owner_sock, [COMMAND.START_NEW_GAME, ""])
+        game_id = expect(owner, COMMAND.START_NEW_GAME)[1]
+        tcp_send(opponent_sock, [COMMAND.JOIN_GAME, game_id])
+        expect(opponent, COMMAND.JOIN_GAME)
+        expect(owner, COMMAND.NOTIFICATION.YOUR_TURN)
+        return game_id, (owner_sock, owner), (opponent_sock, opponent)
+
+    def move(self, player, game_id, cell):
+        ''' :return: response code of the move '''
+        sock, reader = player
+        tcp_send(sock, [COMMAND.MAKE_MOVE, pack_data([game_id, cell])])
+        return expect(reader, COMMAND.MAKE_MOVE)[0]
+
+    def test_moves_in_turn(self):
+        game_id, owner, opponent = self.start_game()
+        stranger = self.connect()
+
+        # "O" can't move first, "X" can't move twice in a row, others can't move at all
+        self.assertEqual(self.move(opponent, game_id, 5), RESP.MOVE_IS_INVALID)
+        self.assertEqual(self.move(owner, game_id, 7), RESP.OK)
+        self.assertEqual(self.move(owner, game_id, 8), RESP.MOVE_IS_INVALID)
+        self.assertEqual(self.move(stranger, game_id, 8), RESP.MOVE_IS_INVALID)
+
+        for player, cell in ((opponent, 4), (owner, 8), (opponent, 5), (owner, 9)):
+            self.assertEqual(self.move(player, game_id, cell), RESP.OK)
+
+        replay = self.server.replays.get(game_id)
+        self.assertEqual(replay["moves"], [7, 4, 8, 5, 9])
+        self.assertEqual(replay["result"], GAME_RESULT.OWNER_WON)
+
+    def test_whole_game(self):
+        owner_sock, owner = self.connect()
+        opponent_sock, opponent = self.connect()
+
+        tcp_send(owner_sock, [COMMAND.START_NEW_GAME, ""])
+        resp_code, game_id = expect(owner, COMMAND.START_NEW_GAME)
+        self.assertEqual(resp_code, RESP.OK)
+
+        tcp_send(opponent_sock, [COMMAND.GAMES_LIST, ""])
+        self.assertIn(game_id, parse_data(expect(opponent, COMMAND.GAMES_LIST)[1]))
+
+        tcp_send(opponent_sock, [COMMAND.JOIN_GAME, game_id])
+        self.assertEqual(expect(opponent, COMMAND.JOIN_GAME), (RESP.OK, game_id))
+        expect(owner, COMMAND.NOTIFICATION.YOUR_TURN)
+
+        # "X" takes the top row
+        moves = [1, 4, 2, 5, 3]
+        players = [(owner_sock, owner), (opponent_sock, opponent)]
+        for k, move in enumerate(moves):
+            sock, reader = players[k % 2]
+            tcp_send(sock, [COMMAND.MAKE_MOVE, pack_data([game_id, move])])
+            self.assertEqual(expect(reader, COMMAND.MAKE_MOVE)[0], RESP.OK)
+            if k < len(moves) - 1:
+                expect(players[(k + 1) % 2][1], COMMAND.NOTIFICATION.YOUR_TURN)
+
+        board = parse_data(expect(owner, COMMAND.NOTIFICATION.YOU_WON)[1])
+        self.assertEqual(board[1:4], ['X', 'X', 'X'])
+        expect(opponent, COMMAND.NOTIFICATION.YOU_LOST)
+
+        # Nobody moves after the end of the game
+        tcp_send(opponent_sock, [COMMAND.MAKE_MOVE, pack_data([game_id, 9])])
+        self.assertEqual(expect(opponent, COMMAND.MAKE_MOVE)[0], RESP.MOVE_IS_INVALID)
+
+        tcp_send(opponent_sock, [COMMAND.GET_REPLAY, game_id])
+        resp_code, data = expect(opponent, COMMAND.GET_REPLAY)
+        self.assertEqual(resp_code, RESP.OK)
+        self.assertEqual([int(move) for move in parse_data(data)], moves)
+        self.assertEqual(self.server.replays.count(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tests of the tournament pairings and of tournaments played on the server.
+
+    Run with: python -m unittest test_tournament  (or python -m pytest)
+'''
+
+# Imports----------------------------------------------------------------------
+import threading
+import unittest
+from itertools import combinations
+from socket import SHUT_RDWR
+from protocol import *
+from replay import GAME_RESULT
+from tournament import Tournament, POINTS_WIN
+from test_server import ServerTestCase
+
+
+# Common -----------------------------------------------------------------------
+TIMEOUT = 10  # seconds to wait for the end of the tournament
+
+
+class Bot(threading.Thread):
+    def __init__(self, sock, reader, passive=False):
+        '''
+        Player who takes the first free cell in his turn
+        :param passive: (Boolean) never make a move
+        '''
+        threading.Thread.__init__(self)
+        self.sock = sock
+        self.reader = reader
+        self.writer = FrameWriter(sock)
+        self.passive = passive
+
+        self.games = []  # ids of the assigned games
+        self.results = []  # notifications about the end of the games
+        self.standings = None
+        self.assigned = threading.Event()
+        self.ended = threading.Event()
+
+    def run(self):
+        while True:
+            m = self.reader.receive()
+            if m is None:
+                return
+            command, resp_code, data = parse_response(m)
+
+            if command == COMMAND.NOTIFICATION.GAME_ASSIGNED:
+                self.games.append(data)
+                self.assigned.set()
+            elif command == COMMAND.NOTIFICATION.YOUR_TURN and not self.passive:
+                cell = parse_data(data).index(' ', 1)
+                self.writer.send([COMMAND.MAKE_MOVE, pack_data([self.games[-1], cell])])
+            elif command in (COMMAND.NOTIFICATION.YOU_WON, COMMAND.NOTIFICATION.YOU_LOST,
+                             COMMAND.NOTIFICATION.GAME_IS_A_TIE):
+                self.results.append(command)
+            elif command == COMMAND.NOTIFICATION.TOURNAMENT_ENDED:
+                data = parse_data(data)
+                self.standings = dict(zip(data[0::2], [int(points) for points in data[1::2]]))
+                self.ended.set()
+
+
+# Tests ------------------------------------------------------------------------
+class TournamentTest(unittest.TestCase):
+    def play(self, tournament, result=GAME_RESULT.OWNER_WON):
+        '''
+        Play all rounds of the tournament, every game ends with the result
+        :return: (list) pairs of every round, (list) players with a bye in every round
+        '''
+        rounds, byes = [], []
+        game_id = 0
+        while tournament.round_n < tournament.rounds:
+            had_bye = set(tournament.byes)
+            pairs = tournament.next_pairings()
+            rounds.append(pairs)
+            byes.append(tournament.byes - had_bye)
+
+            for pair in pairs:
+                game_id += 1
+                tournament.pending[game_id] = pair
+            for pending_id in list(tournament.pending):
+                tournament.record(pending_id, result)
+        return rounds, byes
+
+    def test_round_robin_every_pair(self):
+        for n_players in range(2, 10):
+            players = list(range(1, n_players + 1))
+            tournament = Tournament(1, players, TOURNAMENT_FORMAT.ROUND_ROBIN)
+            rounds, byes = self.play(tournament)
+
+            played = [frozenset(pair) for pairs in rounds for pair in pairs]
+            self.assertEqual(len(played), n_players * (n_players - 1) // 2)
+            self.assertEqual(set(played), set(frozenset(pair) for pair in combinations(players, 2)))
+
+            # Everybody plays once per round, or has a bye
+            for round_n in range(len(rounds)):
+                in_round = [player_id for pair in rounds[round_n] for player_id in pair] + list(byes[round_n])
+                self.assertEqual(sorted(in_round), players)
+
+    def test_swiss_byes(self):
+        tournament = Tournament(1, range(1, 8), TOURNAMENT_FORMAT.SWISS, rounds=10)
+        self.assertEqual(tournament.rounds, 6)
+
+        rounds, byes = self.play(tournament)
+        self.assertEqual([len(bye) for bye in byes], [1] * 6)
+        self.assertEqual(len(set.union(*byes)), 6)
+
+    def test_swiss_no_rematches(self):
+        for n_players, rounds in ((4, 3), (7, 3), (8, 3), (9, 4), (16, 4)):
+            for result in (GAME_RESULT.TIE, GAME_RESULT.OWNER_WON, GAME_RESULT.OPPONENT_WON):
+                tournament = Tournament(1, range(1, n_players + 1), TOURNAMENT_FORMAT.SWISS, rounds)
+                played = [frozenset(pair) for pairs in self.play(tournament, result)[0] for pair in pairs]
+                self.assertEqual(len(played), len(set(played)), (n_players, result))
+
+    def test_swiss_without_gone_player(self):
+        tournament = Tournament(1, range(1, 7), TOURNAMENT_FORMAT.SWISS, rounds=3)
+        tournament.gone.add(6)
+
+        rounds, byes = self.play(tournament)
+        for pairs in rounds:
+            self.assertNotIn(6, [player_id for pair in pairs for player_id in pair])
+        self.assertEqual(tournament.points[6], 0)
+
+
+class SchedulerTest(ServerTestCase):
+    def setUp(self):
+        ServerTestCase.setUp(self)
+        self.bots = []
+
+    def tearDown(self):
+        for bot in self.bots:
+            bot.sock.shutdown(SHUT_RDWR)
+            bot.join()
+        ServerTestCase.tearDown(self)
+
+    def start(self, n_players, tournament_format, passive=()):
+        '''
+        Connect the bots, register them and start the tournament
+        :param passive: numbers of the bots which don't move
+        '''
+        for bot_n in range(n_players):
+            bot = Bot(*self.connect(), passive=bot_n in passive)
+            bot.start()
+            self.bots.append(bot)
+
+        for bot in self.bots:
+            bot.writer.send([COMMAND.REGISTER_TOURNAMENT, ""])
+        while len(self.server.tournaments.registered) < n_players:
+            threading.Event().wait(0.01)
+
+        self.bots[0].writer.send([COMMAND.START_TOURNAMENT, pack_data([tournament_format, ""])])
+
+    def wait_end(self, bots):
+        for bot in bots:
+            self.assertTrue(bot.ended.wait(TIMEOUT), "Tournament did not end")
+
+    def test_rounds_advance(self):
+        self.start(4, TOURNAMENT_FORMAT.ROUND_ROBIN)
+        self.wait_end(self.bots)
+
+        # Everybody played everybody, "X" always wins with the first free cells
+        for bot in self.bots:
+            self.assertEqual(len(bot.games), 3)
+            self.assertEqual(len(bot.results), 3)
+        self.assertEqual(sum(self.bots[0].standings.values()), 6 * POINTS_WIN)
+        self.assertEqual(self.server.replays.count(), 6)
+        self.assertEqual(self.server.tournaments.tournaments, {})
+
+    def test_swiss_with_bye(self):
+        self.start(5, TOURNAMENT_FORMAT.SWISS)
+        self.wait_end(self.bots)
+
+        # 3 rounds, 2 games and a bye in each one
+        self.assertEqual(sum(self.bots[0].standings.values()), 3 * 3 * POINTS_WIN)
+        self.assertEqual(self.server.replays.count(), 6)
+
+    def test_disconnect_forfeits(self):
+        self.start(4, TOURNAMENT_FORMAT.ROUND_ROBIN, passive=[3])
+        leaver = self.bots[3]
+        self.assertTrue(leaver.assigned.wait(TIMEOUT))
+        leaver.sock.shutdown(SHUT_RDWR)
+
+        others = self.bots[:3]
+        self.wait_end(others)
+
+        # Game of the first round is forfeited, games of the next rounds are not even created
+        standings = others[0].standings
+        self.assertEqual(standings["4"], 0)
+        self.assertEqual(sum(standings.values()), 6 * POINTS_WIN)
+        self.assertEqual(self.server.replays.count(), 3)
+        self.assertEqual(sum(len(bot.games) for bot in others), 2 * 3 + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tests of the transports.
+
+    Run with: python -m unittest test_transport  (or python -m pytest)
+'''
+
+# Imports----------------------------------------------------------------------
+import os
+import errno
+import shutil
+import tempfile
+import unittest
+from socket import error as socket_error
+from transport import AF_UNIX, UnixTransport
+
+
+# Tests ------------------------------------------------------------------------
+@unittest.skipIf(AF_UNIX is None, "Unix domain sockets are not supported")
+class UnixTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "ttt.sock")
+        self.transport = UnixTransport(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stale_socket_is_replaced(self):
+        self.transport.listen().close()
+        self.assertTrue(os.path.exists(self.path))
+
+        listener = self.transport.listen()
+        try:
+            self.transport.connect().close()
+        finally:
+            listener.close()
+
+    def test_socket_in_use(self):
+        listener = self.transport.listen()
+        try:
+            with self.assertRaises(socket_error) as raised:
+                self.transport.listen()
+            self.assertEqual(raised.exception.errno, errno.EADDRINUSE)
+        finally:
+            listener.close()
+
+    def test_other_file_is_kept(self):
+        with open(self.path, 'w') as f:
+            f.write("not a socket")
+
+        with self.assertRaises(socket_error) as raised:
+            self.transport.listen()
+        self.assertEqual(raised.exception.errno, errno.ENOTSOCK)
+
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "not a socket")
+
+
+if __name__ == '__main__':
+    unittest.main()
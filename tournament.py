@@ -0,0 +1,375 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Tournaments between connected players.
+
+    Players register, then a tournament is started for everybody registered.
+    Games of the round are created on the server in one batch, results come
+    from the server when a game finishes, and the next round starts as soon as
+    the last game of the current one is over.
+
+    Pairings cost O(players) per round:
+        round robin - circle method (one player is fixed, the others rotate)
+        swiss       - players are bucket sorted by points and paired greedily
+                      with the closest neighbour they haven't played yet
+                      (a bounded search goes back when the last players
+                      would have to play again)
+'''
+
+# Setup Python logging --------------------------------------------------------
+import logging
+
+FORMAT = '%(asctime)-15s %(levelname)s %(message)s'
+logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+LOG = logging.getLogger()
+
+
+# Imports----------------------------------------------------------------------
+import threading
+from collections import deque
+from protocol import COMMAND, TOURNAMENT_FORMAT, pack_data
+from replay import GAME_RESULT
+
+
+# Common -----------------------------------------------------------------------
+POINTS_WIN = 2
+POINTS_TIE = 1
+POINTS_BYE = POINTS_WIN  # player without opponent in the round
+
+SWISS_LOOKAHEAD = 8  # how far to look for an opponent the player hasn't played yet
+SWISS_SEARCH_STEPS = 32  # per player, pairing search without rematches gives up after that
+
+
+# Main functions ---------------------------------------------------------------
+def round_robin_pairings(players, round_n):
+    '''
+    :param players: (list) player ids, an odd number of players gets None for a bye
+    :param round_n: number of the round, starting from 0
+    :return: (list) (owner_id, opponent_id) pairs, owner_id or opponent_id is None for a bye
+    '''
+    players = list(players)
+    if len(players) % 2:
+        players.append(None)
+
+    n = len(players)
+    shift = round_n % (n - 1)
+
+    # The first player stays in place, the others rotate by one position per round
+    rotated = [players[0]] + players[1 + (n - 1 - shift):] + players[1:1 + (n - 1 - shift)]
+
+    pairs = []
+    for i in range(n // 2):
+        owner, opponent = rotated[i], rotated[n - 1 - i]
+
+        # Change sides every round, so everybody plays "X" about half of the games
+        if round_n % 2:
+            owner, opponent = opponent, owner
+        pairs.append((owner, opponent))
+    return pairs
+
+
+def swiss_pairings(players, points, played, byes, round_n):
+    '''
+    :param players: (list) player ids in seed order
+    :param points: (dict) in format <player_id>: points
+    :param played: (set) frozensets of players who already played each other
+    :param byes: (set) players who already had a bye
+    :param round_n: number of the round, starting from 0
+    :return: (list) (owner_id, opponent_id) pairs, opponent_id is None for a bye
+    '''
+    # Points are small integers, so bucket sort keeps it linear (seed order inside the bucket)
+    buckets = [[] for _ in range(max(points.values()) + 1)]
+    for player_id in players:
+        buckets[points[player_id]].append(player_id)
+    ranked = deque(player_id for bucket in reversed(buckets) for player_id in bucket)
+
+    pairs = []
+
+    # The lowest ranked player without a bye sits out (just the lowest one if everybody had it)
+    if len(ranked) % 2:
+        bye_n = len(ranked) - 1
+        for i in range(len(ranked) - 1, -1, -1):
+            if ranked[i] not in byes:
+                bye_n = i
+                break
+        pairs.append((ranked[bye_n], None))
+        del ranked[bye_n]
+
+    # Closest opponents without rematches, just the closest ones if there's no such pairing
+    found = pair_without_rematches(list(ranked), played, SWISS_SEARCH_STEPS * len(ranked))
+    if found is not None:
+        for player_id, opponent_id in found:
+            if round_n % 2:
+                pairs.append((opponent_id, player_id))
+            else:
+                pairs.append((player_id, opponent_id))
+        return pairs
+
+    while ranked:
+        player_id = ranked.popleft()
+
+        # The closest neighbour the player hasn't played yet, or just the closest one
+        opponent_n = 0
+        for i in range(min(SWISS_LOOKAHEAD, len(ranked))):
+            if frozenset((player_id, ranked[i])) not in played:
+                opponent_n = i
+                break
+        opponent_id = ranked[opponent_n]
+        del ranked[opponent_n]
+
+        if round_n % 2:
+            pairs.append((opponent_id, player_id))
+        else:
+            pairs.append((player_id, opponent_id))
+    return pairs
+
+
+def pair_without_rematches(ranked, played, max_steps):
+    '''
+    Depth-first search over the ranking: the first unpaired player takes the closest
+    opponent he hasn't played yet, the next ones are tried only if the rest can't be paired
+    :param ranked: player ids from the first place to the last (even number of them)
+    :param played: (set) frozensets of players who already played each other
+    :param max_steps: number of tried opponents after which the search gives up
+    :return: (list) (player_id, opponent_id) pairs or None if nothing was found
+    '''
+    n = len(ranked)
+    paired = [False] * n
+    stack = []  # chosen pairs in format (player position, opponent position, opponent number)
+
+    i, k = 0, 0  # first unpaired player and the number of his next opponent
+    for _ in range(max_steps):
+        while i < n and paired[i]:
+            i += 1
+        if i == n:
+            return [(ranked[player_n], ranked[opponent_n]) for player_n, opponent_n, _ in stack]
+
+        # k-th unpaired player after the i-th one
+        j, unpaired = i + 1, -1
+        while j < n:
+            if not paired[j]:
+                unpaired += 1
+                if unpaired == k:
+                    break
+            j += 1
+
+        # No more opponents for the player, take the next opponent for the previous one
+        if j == n or k >= SWISS_LOOKAHEAD:
+            if not stack:
+                return None
+            i, j, k = stack.pop()
+            paired[i] = paired[j] = False
+            k += 1
+
+        elif frozenset((ranked[i], ranked[j])) in played:
+            k += 1
+
+        else:
+            paired[i] = paired[j] = True
+            stack.append((i, j, k))
+            k = 0
+    return None
+
+
+class Tournament(object):
+    def __init__(self, tournament_id, players, tournament_format, rounds=None):
+        '''
+        :param tournament_id: id of the tournament
+        :param players: (list) player ids in seed order
+        :param tournament_format: TOURNAMENT_FORMAT
+        :param rounds: number of rounds (by default everybody plays everybody in round robin,
+                       enough rounds to find the winner in swiss), it's cut to the number of
+                       distinct opponents, see self.rounds for the actual number
+        '''
+        self.id = str(tournament_id)
+        self.players = list(players)
+        self.format = tournament_format
+
+        # Round robin also needs a round per bye when the number of players is odd
+        n_players = len(self.players)
+        if tournament_format == TOURNAMENT_FORMAT.ROUND_ROBIN:
+            max_rounds = default_rounds = n_players - 1 + n_players % 2
+        else:
+            max_rounds = n_players - 1
+            default_rounds = (n_players - 1).bit_length()  # log2(players) rounded up
+        self.rounds = min(rounds, max_rounds) if rounds else default_rounds
+
+        self.round_n = 0  # rounds started
+        self.points = dict.fromkeys(self.players, 0)
+        self.gone = set()  # disconnected players, their opponents win without a game
+        self.played = set()
+        self.byes = set()
+        self.pending = {}  # games of the current round in format <game_id>: (owner_id, opponent_id)
+
+    def next_pairings(self):
+        '''
+        Pairings of the next round, players with a bye get their points right away
+        :return: (list) (owner_id, opponent_id) pairs of the games to create
+        '''
+        if self.format == TOURNAMENT_FORMAT.ROUND_ROBIN:
+            pairs = round_robin_pairings(self.players, self.round_n)
+        else:
+            players = [player_id for player_id in self.players if player_id not in self.gone]
+            pairs = swiss_pairings(players, self.points, self.played, self.byes, self.round_n) if players else []
+        self.round_n += 1
+
+        games = []
+        for owner_id, opponent_id in pairs:
+            if owner_id is None or opponent_id is None:
+                bye_player = owner_id if opponent_id is None else opponent_id
+                self.byes.add(bye_player)
+                self.points[bye_player] += POINTS_BYE
+            elif owner_id in self.gone or opponent_id in self.gone:
+                for player_id in (owner_id, opponent_id):
+                    if player_id not in self.gone:
+                        self.points[player_id] += POINTS_WIN
+            else:
+                self.played.add(frozenset((owner_id, opponent_id)))
+                games.append((owner_id, opponent_id))
+        return games
+
+    def record(self, game_id, result):
+        '''
+        :param game_id: id of the finished game of the current round
+        :param result: GAME_RESULT
+        :return: (Boolean) True if it was the last game of the round
+        '''
+        owner_id, opponent_id = self.pending.pop(game_id)
+
+        if result == GAME_RESULT.OWNER_WON:
+            self.points[owner_id] += POINTS_WIN
+        elif result == GAME_RESULT.OPPONENT_WON:
+            self.points[opponent_id] += POINTS_WIN
+        else:
+            self.points[owner_id] += POINTS_TIE
+            self.points[opponent_id] += POINTS_TIE
+
+        return not self.pending
+
+    def standings(self):
+        ''' (list) (player_id, points) from the first place to the last '''
+        return sorted(self.points.items(), key=lambda item: item[1], reverse=True)
+
+
+class TournamentScheduler(object):
+    def __init__(self, server):
+        ''' Tournaments of the server '''
+        self.server = server
+        self.lock = threading.Lock()
+
+        self.registered = []  # players for the next tournament, in order of registration
+        self.tournaments = {}  # in format <tournament_id>: Tournament
+        self.games = {}  # in format <game_id>: Tournament
+        self.tournament_id = 1
+
+    def register(self, player_id):
+        '''
+        :param player_id: player who wants to take part in the next tournament
+        :return: number of registered players
+        '''
+        with self.lock:
+            if player_id not in self.registered:
+                self.registered.append(player_id)
+            return len(self.registered)
+
+    def start(self, tournament_format, rounds=None):
+        '''
+        Start the tournament for all registered players
+        :param tournament_format: TOURNAMENT_FORMAT
+        :param rounds: number of rounds (see Tournament)
+        :return: Tournament or None if there're less than 2 players
+        '''
+        with self.lock:
+            if len(self.registered) < 2:
+                return None
+
+            tournament = Tournament(self.tournament_id, self.registered, tournament_format, rounds)
+            self.tournaments[tournament.id] = tournament
+            self.tournament_id += 1
+            self.registered = []
+
+            LOG.info("Tournament %s started: %s, %d players, %d rounds" % (
+                tournament.id, tournament.format, len(tournament.players), tournament.rounds))
+            self._start_round(tournament)
+        return tournament
+
+    def on_game_end(self, game_id, result):
+        '''
+        Called by the server for every finished game
+        :param game_id: id of the finished game
+        :param result: GAME_RESULT
+        '''
+        with self.lock:
+            self._record(game_id, result)
+
+    def leave(self, player_id):
+        '''
+        Called by the server when the player disconnects.
+        His current games are forfeited, in next rounds his opponents win without a game.
+        :param player_id: id of the disconnected player
+        '''
+        with self.lock:
+            if player_id in self.registered:
+                self.registered.remove(player_id)
+
+            for tournament in self.tournaments.values():
+                if player_id in tournament.points:
+                    tournament.gone.add(player_id)
+
+            forfeits = []
+            for game_id, tournament in self.games.items():
+                owner_id, opponent_id = tournament.pending[game_id]
+                if player_id not in (owner_id, opponent_id):
+                    continue
+
+                # The game may have just finished with a move, then its result counts
+                if not self.server.mark_finished(game_id):
+                    continue
+
+                if player_id == owner_id:
+                    winner_id, result = opponent_id, GAME_RESULT.OPPONENT_WON
+                else:
+                    winner_id, result = owner_id, GAME_RESULT.OWNER_WON
+
+                board = self.server.games[game_id]["board"]
+                self.server.notify(winner_id, COMMAND.NOTIFICATION.YOU_WON, pack_data(board))
+                forfeits.append((game_id, result))
+
+            for game_id, result in forfeits:
+                LOG.debug("Game %s is forfeited by player %s" % (game_id, player_id))
+                self._record(game_id, result)
+
+    def _record(self, game_id, result):
+        tournament = self.games.pop(game_id, None)
+        if tournament is None:
+            return
+
+        if tournament.record(game_id, result):
+            self._start_round(tournament)
+
+    def _start_round(self, tournament):
+        # Rounds where everybody has a bye don't need to wait for games
+        while tournament.round_n < tournament.rounds:
+            pairs = tournament.next_pairings()
+            if pairs:
+                break
+        else:
+            self._finish(tournament)
+            return
+
+        game_ids = self.server.create_games(pairs)
+        for game_id, pair in zip(game_ids, pairs):
+            tournament.pending[game_id] = pair
+            self.games[game_id] = tournament
+
+        LOG.debug("Tournament %s: round %d started, %d games" % (tournament.id, tournament.round_n, len(pairs)))
+
+    def _finish(self, tournament):
+        standings = tournament.standings()
+        data = pack_data([el for player_points in standings for el in player_points])
+        for player_id in tournament.players:
+            self.server.notify(player_id, COMMAND.NOTIFICATION.TOURNAMENT_ENDED, data)
+
+        del self.tournaments[tournament.id]
+        LOG.info("Tournament %s finished, standings: %s" % (tournament.id, standings))
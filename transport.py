@@ -0,0 +1,268 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+    Transports between client and server.
+
+    Transport knows how to create the listening side for the server (listen),
+    a connected socket for the client (connect) and how to close it (close).
+    Listener is anything with accept() -> (socket, address) and close(),
+    so the server loop doesn't depend on the kind of the connection.
+'''
+
+# Setup Python logging --------------------------------------------------------
+import logging
+
+FORMAT = '%(asctime)-15s %(levelname)s %(message)s'
+logging.basicConfig(level=logging.DEBUG, format=FORMAT)
+LOG = logging.getLogger()
+
+
+# Imports----------------------------------------------------------------------
+import os
+import ssl
+import stat
+import errno
+import queue
+from socket import AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, SHUT_RDWR, SOMAXCONN, socket, socketpair, \
+    error as socket_error
+from protocol import SERVER_INET_ADDR, SERVER_PORT, close_socket
+
+try:
+    from socket import AF_UNIX
+except ImportError:
+    AF_UNIX = None  # not available on Windows
+
+
+# Common -----------------------------------------------------------------------
+BACKLOG = SOMAXCONN  # connections waiting for accept, with 0 a burst of reconnects waits for SYN retries
+TLS_TICKETS = 2  # session tickets sent to the client after the TLS 1.3 handshake
+
+
+class Transport(object):
+    def close(self, sock, log_msg=""):
+        ''' Close the socket returned by connect() '''
+        close_socket(sock, log_msg)
+
+
+class TcpTransport(Transport):
+    def __init__(self, host=SERVER_INET_ADDR, port=SERVER_PORT):
+        self.host = host
+        self.port = int(port)
+
+    def __str__(self):
+        return "tcp://%s:%d" % (self.host, self.port)
+
+    def listen(self):
+        s = socket(AF_INET, SOCK_STREAM)
+        s.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+
+        try:
+            s.bind((self.host, self.port))
+        except socket_error:
+            s.close()
+            raise
+
+        s.listen(BACKLOG)
+        return s
+
+    def connect(self):
+        s = socket(AF_INET, SOCK_STREAM)
+        try:
+            s.connect((self.host, self.port))
+        except socket_error:
+            s.close()
+            raise
+        return s
+
+
+class UnixTransport(Transport):
+    def __init__(self, path):
+        if AF_UNIX is None:
+            raise ValueError("Unix domain sockets are not supported on this platform")
+        self.path = path
+
+    def __str__(self):
+        return "unix://%s" % self.path
+
+    def listen(self):
+        s = socket(AF_UNIX, SOCK_STREAM)
+
+        # Socket file is left after the previous run, remove it if nobody listens there
+        if os.path.exists(self.path):
+            # Any other file at the path is not ours to remove
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                s.close()
+                raise socket_error(errno.ENOTSOCK, "%s exists and is not a socket" % self.path)
+
+            try:
+                self.connect().close()
+            except socket_error:
+                os.unlink(self.path)
+            else:
+                s.close()
+                raise socket_error(errno.EADDRINUSE, os.strerror(errno.EADDRINUSE))
+
+        try:
+            s.bind(self.path)
+        except socket_error:
+            s.close()
+            raise
+
+        s.listen(BACKLOG)
+        return s
+
+    def connect(self):
+        s = socket(AF_UNIX, SOCK_STREAM)
+        try:
+            s.connect(self.path)
+        except socket_error:
+            s.close()
+            raise
+        return s
+
+
+class SocketPairListener(object):
+    def __init__(self):
+        ''' Server ends of the socket pairs which were not accepted yet '''
+        self.pending = queue.Queue()
+        self.closed = False
+
+    def accept(self):
+        sock = self.pending.get()
+        if sock is None:
+            raise socket_error(errno.EBADF, "Listener is closed")
+        return sock, "socketpair"
+
+    def close(self):
+        self.closed = True
+        self.pending.put(None)
+
+
+class SocketPairTransport(Transport):
+    ''' In-process transport, every connection is a socket pair (for bots and tests in the same process) '''
+    def __init__(self):
+        self.listener = None
+
+    def __str__(self):
+        return "socketpair"
+
+    def listen(self):
+        self.listener = SocketPairListener()
+        return self.listener
+
+    def connect(self):
+        if self.listener is None or self.listener.closed:
+            raise socket_error(errno.ECONNREFUSED, os.strerror(errno.ECONNREFUSED))
+
+        server_end, client_end = socketpair()
+        self.listener.pending.put(server_end)
+        return client_end
+
+
+class TlsListener(object):
+    def __init__(self, listener, context):
+        self.listener = listener
+        self.context = context
+
+    def accept(self):
+        '''
+        Handshake is not done here, it's done by the first read in the client's thread,
+        so a slow client doesn't stop accepting others
+        '''
+        sock, addr = self.listener.accept()
+        try:
+            return self.context.wrap_socket(sock, server_side=True, do_handshake_on_connect=False), addr
+        except socket_error:
+            sock.close()
+            raise
+
+    def close(self):
+        close_listener(self.listener)
+
+
+class TlsTransport(Transport):
+    def __init__(self, transport, context, server_hostname=None):
+        '''
+        TLS over another transport
+        :param transport: transport for the encrypted data
+        :param context: (ssl.SSLContext) see make_server_context/make_client_context
+        :param server_hostname: name in the server's certificate (client side only)
+        '''
+        self.transport = transport
+        self.context = context
+        self.server_hostname = server_hostname
+
+        # Session of the last connection, next connect() resumes it instead of the full handshake
+        self.session = None
+
+    def __str__(self):
+        return "tls+%s" % self.transport
+
+    def listen(self):
+        return TlsListener(self.transport.listen(), self.context)
+
+    def connect(self):
+        sock = self.transport.connect()
+        try:
+            return self.context.wrap_socket(sock, server_hostname=self.server_hostname, session=self.session)
+        except socket_error:
+            sock.close()
+            raise
+
+    def close(self, sock, log_msg=""):
+        # With TLS 1.3 the ticket comes after the handshake, so the session is taken before closing
+        try:
+            if sock.session is not None:
+                self.session = sock.session
+        except (AttributeError, ValueError):
+            pass
+        close_socket(sock, log_msg)
+
+
+# Main functions ---------------------------------------------------------------
+def make_server_context(certfile, keyfile=None):
+    '''
+    :param certfile: server's certificate (PEM)
+    :param keyfile: server's private key (PEM), if it's not in the certfile
+    :return: (ssl.SSLContext) server context which issues session tickets
+    '''
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    context.num_tickets = TLS_TICKETS
+    return context
+
+
+def make_client_context(cafile=None):
+    '''
+    :param cafile: certificates to trust (PEM), system ones if not given
+    :return: (ssl.SSLContext) client context which verifies the server
+    '''
+    return ssl.create_default_context(cafile=cafile)
+
+
+def make_transport(host=SERVER_INET_ADDR, port=SERVER_PORT, unix_path=None, tls_context=None):
+    '''
+    :param host: server INET address
+    :param port: server TCP port
+    :param unix_path: path of the unix domain socket (used instead of host and port if given)
+    :param tls_context: (ssl.SSLContext) wrap the connection into TLS if given
+    :return: transport
+    '''
+    if unix_path:
+        transport = UnixTransport(unix_path)
+    else:
+        transport = TcpTransport(host, port)
+
+    if tls_context is not None:
+        transport = TlsTransport(transport, tls_context, server_hostname=host)
+    return transport
+
+
+def close_listener(listener):
+    ''' Close the listener and wake up the thread blocked in accept() '''
+    try:
+        listener.shutdown(SHUT_RDWR)
+    except (AttributeError, socket_error):
+        pass
+    listener.close()